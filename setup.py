@@ -1,4 +1,7 @@
+import os
+
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 from setuptools.command.install import install
 
 from storyscript.version import version
@@ -29,6 +32,25 @@ extras = [
 ]
 
 
+class BuildPy(build_py):
+    """
+    Generates the standalone parser module, so that installed packages don't
+    need to build the grammar at runtime.
+    """
+
+    def run(self):
+        build_py.run(self)
+        try:
+            from storyscript.parser import Parser
+        except ImportError:
+            self.warn('lark is not available, skipping the standalone parser')
+            return
+        path = os.path.join(self.build_lib, 'storyscript', 'parser',
+                            'standalone.py')
+        if not self.dry_run:
+            Parser().generate(path)
+
+
 setup(name='storyscript',
       version=version,
       description='',
@@ -44,9 +66,13 @@ setup(name='storyscript',
       include_package_data=True,
       zip_safe=True,
       install_requires=requirements,
+      setup_requires=['lark-parser>=0.5.4'],
       extras_require={
           'docs': extras
       },
+      cmdclass={
+          'build_py': BuildPy
+      },
       entry_points={
           'console_scripts': ['storyscript=storyscript.cli:Cli.main']
       })
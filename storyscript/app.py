@@ -1,13 +1,23 @@
 # -*- coding: utf-8 -*-
+import importlib
 import json
 import os
+import pkgutil
+from functools import partial
+from multiprocessing import Pool
 
+from .cache import Cache
 from .compiler import Compiler
+from .output import Output
 from .parser import Grammar, Parser
+from .version import version
+from .watcher import Watcher
 
 
 class App:
 
+    fingerprint = None
+
     @staticmethod
     def read_story(storypath):
         """
@@ -31,15 +41,107 @@ class App:
         return [storypath]
 
     @classmethod
-    def parse(cls, stories, ebnf_file=None):
+    def compiler_fingerprint(cls):
+        """
+        Hashes the sources of the compiler and the parser, so that compiled
+        stories are not taken from the cache after the code producing them
+        changed. The standalone module is left out, as the grammar checksum
+        already covers it. The fingerprint is empty when the sources can't be
+        read, and stories are then not cached.
+        """
+        if cls.fingerprint is None:
+            resources = []
+            for package in ('compiler', 'parser'):
+                module = importlib.import_module('.' + package, __package__)
+                resources.append('{}/__init__.py'.format(package))
+                modules = pkgutil.iter_modules(module.__path__)
+                for name in sorted([info[1] for info in modules]):
+                    if name != 'standalone':
+                        resources.append('{}/{}.py'.format(package, name))
+            fingerprint = Cache.fingerprint(__package__, resources)
+            cls.fingerprint = fingerprint or ''
+        return cls.fingerprint
+
+    @classmethod
+    def compile_source(cls, source, ebnf_file=None):
         """
-        Parses a list of stories, returning their tree.
+        Parses and compiles a story's source. Results are cached by source,
+        grammar, version and compiler, so that unchanged stories are not
+        compiled again.
         """
-        results = {}
-        for story in stories:
-            tree = Parser(ebnf_file=ebnf_file).parse(cls.read_story(story))
-            results[story] = Compiler.compile(tree)
-        return results
+        parser = Parser(ebnf_file=ebnf_file)
+        fingerprint = cls.compiler_fingerprint()
+        if not fingerprint:
+            return Compiler.compile(parser.parse(source))
+        cache = Cache('stories')
+        key = Cache.key(source, parser.checksum(), version, fingerprint)
+        compiled = cache.get(key)
+        if compiled is None:
+            compiled = Compiler.compile(parser.parse(source))
+            cache.set(key, compiled)
+        return compiled
+
+    @classmethod
+    def parse_story(cls, story, ebnf_file=None):
+        """
+        Parses and compiles a single story
+        """
+        return cls.compile_source(cls.read_story(story), ebnf_file=ebnf_file)
+
+    @classmethod
+    def parse_job(cls, story, ebnf_file=None):
+        """
+        Compiles a story in a worker process. Errors are not sent back, as
+        they might not be picklable: the story is compiled again by the main
+        process, raising the error there.
+        """
+        try:
+            return cls.parse_story(story, ebnf_file=ebnf_file)
+        except Exception:
+            return None
+
+    @staticmethod
+    def preload(ebnf_file=None):
+        """
+        Builds the parser in advance, so that workers start warm
+        """
+        Parser(ebnf_file=ebnf_file).lark()
+
+    @classmethod
+    def parse_parallel(cls, stories, jobs, ebnf_file=None):
+        """
+        Compiles stories using a pool of worker processes, yielding them in
+        order as soon as they are compiled
+        """
+        job = partial(cls.parse_job, ebnf_file=ebnf_file)
+        with Pool(jobs, initializer=cls.preload,
+                  initargs=(ebnf_file, )) as pool:
+            for story, compiled in zip(stories, pool.imap(job, stories)):
+                if compiled is None:
+                    compiled = cls.parse_story(story, ebnf_file=ebnf_file)
+                yield story, compiled
+
+    @classmethod
+    def compiled_stories(cls, stories, ebnf_file=None, jobs=1):
+        """
+        Compiles a list of stories, yielding each story with its tree as soon
+        as it's compiled. When jobs is greater than one, stories are compiled
+        in parallel; zero uses all the available cores.
+        """
+        if jobs == 0:
+            jobs = os.cpu_count()
+        if jobs > 1 and len(stories) > 1:
+            return cls.parse_parallel(stories, jobs, ebnf_file=ebnf_file)
+        return ((story, cls.parse_story(story, ebnf_file=ebnf_file))
+                for story in stories)
+
+    @classmethod
+    def parse(cls, stories, ebnf_file=None, jobs=1):
+        """
+        Parses a list of stories, returning their tree
+        """
+        return dict(cls.compiled_stories(stories, ebnf_file=ebnf_file,
+                                         jobs=jobs))
 
     @staticmethod
     def services(stories):
@@ -53,28 +155,164 @@ class App:
         services.sort()
         return services
 
+    @staticmethod
+    def json_options(compact=False):
+        """
+        Gets the options of json.dumps for indented or compact output
+        """
+        if compact:
+            return {'separators': (',', ':')}
+        return {'indent': 2}
+
+    @classmethod
+    def bundle(cls, compiled_stories):
+        """
+        Bundles compiled stories with the services they use
+        """
+        services = cls.services(compiled_stories)
+        return {'stories': compiled_stories, 'services': services}
+
     @classmethod
-    def compile(cls, path, ebnf_file=None):
+    def dumps(cls, compiled_stories, compact=False):
+        """
+        Produces the JSON output for compiled stories
+        """
+        dictionary = cls.bundle(compiled_stories)
+        return json.dumps(dictionary, **cls.json_options(compact))
+
+    @classmethod
+    def dumps_stream(cls, compiled_stories, compact=False):
+        """
+        Produces the same output as dumps in chunks, taking the stories as
+        they are compiled, so that only one story is held at a time.
+        """
+        options = cls.json_options(compact)
+        newline, indent, colon = '\n', '  ', ': '
+        if compact:
+            newline, indent, colon = '', '', ':'
+        services = set()
+        separator = ''
+        yield '{}{}{}"stories"{}{{'.format('{', newline, indent, colon)
+        for story, compiled in compiled_stories:
+            services.update(compiled['services'])
+            tree = json.dumps(compiled, **options)
+            yield '{}{}{}{}{}'.format(separator, newline, indent * 2,
+                                      json.dumps(story), colon)
+            yield tree.replace('\n', newline + indent * 2)
+            separator = ','
+        if separator:
+            yield newline + indent
+        services = json.dumps(sorted(services), **options)
+        yield '}},{}{}"services"{}{}{}}}'.format(
+            newline, indent, colon, services.replace('\n', newline + indent),
+            newline)
+
+    @classmethod
+    def dumps_lines(cls, compiled_stories):
+        """
+        Produces JSON Lines for compiled stories, one story per line as they
+        are compiled, followed by the services of all of them.
+        """
+        options = cls.json_options(compact=True)
+        services = set()
+        for story, compiled in compiled_stories:
+            services.update(compiled['services'])
+            line = {'story': story, 'compiled': compiled}
+            yield '{}\n'.format(json.dumps(line, **options))
+        line = {'services': sorted(services)}
+        yield '{}\n'.format(json.dumps(line, **options))
+
+    @classmethod
+    def stream(cls, path, ebnf_file=None, jobs=1, compact=False,
+               jsonl=False):
+        """
+        Compiles the stories in path, producing their JSON output in chunks
+        """
+        stories = cls.get_stories(path)
+        compiled_stories = cls.compiled_stories(stories, ebnf_file=ebnf_file,
+                                                jobs=jobs)
+        if jsonl:
+            return cls.dumps_lines(compiled_stories)
+        return cls.dumps_stream(compiled_stories, compact=compact)
+
+    @classmethod
+    def compile(cls, path, ebnf_file=None, jobs=1, compact=False,
+                jsonl=False):
         """
         Parse and compile stories in path to JSON
         """
+        return ''.join(cls.stream(path, ebnf_file=ebnf_file, jobs=jobs,
+                                  compact=compact, jsonl=jsonl))
+
+    @classmethod
+    def compile_dict(cls, path, ebnf_file=None, jobs=1):
+        """
+        Parse and compile stories in path, returning the same structure as
+        compile, without encoding it to JSON
+        """
         stories = cls.get_stories(path)
-        compiled_stories = cls.parse(stories, ebnf_file=ebnf_file)
-        services = cls.services(compiled_stories)
-        dictionary = {'stories': compiled_stories, 'services': services}
-        return json.dumps(dictionary, indent=2)
+        return cls.bundle(cls.parse(stories, ebnf_file=ebnf_file, jobs=jobs))
+
+    @classmethod
+    def compile_sources(cls, sources, ebnf_file=None):
+        """
+        Compiles stories from a dictionary of names and sources, returning
+        the same structure as compile_dict. Stories are neither read from nor
+        cached on the disk, and the parser is built only once per process.
+        """
+        parser = Parser(ebnf_file=ebnf_file)
+        compiled_stories = {}
+        for name, source in sources.items():
+            compiled_stories[name] = Compiler.compile(parser.parse(source))
+        return cls.bundle(compiled_stories)
+
+    @staticmethod
+    def write(path, chunks):
+        """
+        Writes chunks of content to a file atomically
+        """
+        Output.write(path, chunks)
+
+    @classmethod
+    def watch(cls, path, output_file_path, ebnf_file=None):
+        """
+        Compiles the stories in path every time they change, keeping the
+        parser warm and compiling only the changed stories. The output file
+        is written when all stories compile. Yields the changed stories and
+        the errors of the stories that don't compile.
+        """
+        cls.preload(ebnf_file=ebnf_file)
+        compiled_stories = {}
+        errors = {}
+        for changed, removed in Watcher(path, cls.get_stories).watch():
+            for story in removed:
+                compiled_stories.pop(story, None)
+                errors.pop(story, None)
+            for story in changed:
+                try:
+                    compiled = cls.parse_story(story, ebnf_file=ebnf_file)
+                except Exception as error:
+                    errors[story] = error
+                    continue
+                compiled_stories[story] = compiled
+                errors.pop(story, None)
+            if errors == {}:
+                stories = {}
+                for story in cls.get_stories(path):
+                    if story in compiled_stories:
+                        stories[story] = compiled_stories[story]
+                cls.write(output_file_path, [cls.dumps(stories)])
+            yield changed, dict(errors)
 
     @classmethod
     def lex(cls, path):
         """
-        Parse and lex stories, producing the list of used tokens
+        Lexes stories, yielding each story with its tokens. Stories are read
+        and lexed lazily, only as the tokens are consumed.
         """
         parser = Parser()
-        stories = cls.get_stories(path)
-        results = {}
-        for story in stories:
-            results[story] = parser.lex(cls.read_story(story))
-        return results
+        for story in cls.get_stories(path):
+            yield story, parser.lex(cls.read_story(story))
 
     @staticmethod
     def grammar():
@@ -82,3 +320,22 @@ class App:
         Returns the current grammar
         """
         return Grammar().build()
+
+    @staticmethod
+    def cache_stats():
+        """
+        Returns statistics for each cache section
+        """
+        stats = {}
+        for section in Cache.sections():
+            stats[section] = Cache(section).stats()
+        return stats
+
+    @staticmethod
+    def clear_cache():
+        """
+        Clears the disk cache and the parsers built by this process
+        """
+        for section in Cache.sections():
+            Cache(section).clear()
+        Parser.clear_cache()
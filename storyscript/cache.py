@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import pickle
+import pkgutil
+import shutil
+import tempfile
+
+
+class Cache:
+
+    """
+    A persistent cache, stored under $XDG_CACHE_HOME/storyscript and divided
+    in sections. Entries are written atomically, so that concurrent
+    invocations never read a partial entry. Setting $STORYSCRIPT_NO_CACHE
+    bypasses it.
+    """
+
+    def __init__(self, section, root=None):
+        self.section = section
+        self.root = root or self.default_root()
+
+    @staticmethod
+    def default_root():
+        root = os.environ.get('XDG_CACHE_HOME')
+        if not root:
+            root = os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(root, 'storyscript')
+
+    @staticmethod
+    def disabled():
+        """
+        Whether the cache is bypassed, with $STORYSCRIPT_NO_CACHE
+        """
+        return bool(os.environ.get('STORYSCRIPT_NO_CACHE'))
+
+    @staticmethod
+    def key(*parts):
+        """
+        Produces an entry key from the given parts
+        """
+        string = '\0'.join([str(part) for part in parts])
+        return hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def fingerprint(package, resources):
+        """
+        Hashes resources of a package. They are read through the package's
+        loader, so that this works when it's imported from a zip file too.
+        Returns None when a resource can't be read.
+        """
+        digest = hashlib.sha256()
+        for resource in resources:
+            try:
+                data = pkgutil.get_data(package, resource)
+            except OSError:
+                return None
+            if data is None:
+                return None
+            digest.update(data)
+        return digest.hexdigest()
+
+    def directory(self):
+        return os.path.join(self.root, self.section)
+
+    def path(self, key):
+        return os.path.join(self.directory(), key)
+
+    def get(self, key):
+        """
+        Gets an entry, returning None when it's missing or unreadable.
+        """
+        if self.disabled():
+            return None
+        try:
+            with open(self.path(key), 'rb') as file:
+                return pickle.load(file)
+        except (OSError, EOFError, AttributeError, ImportError,
+                pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        """
+        Writes an entry to a temporary file and then moves it in place. The
+        cache is best-effort: entries that can't be written are skipped.
+        """
+        if self.disabled():
+            return
+        try:
+            os.makedirs(self.directory(), exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory())
+        except OSError:
+            return
+        replaced = False
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path(key))
+            replaced = True
+        except Exception:
+            pass
+        finally:
+            if replaced is False:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Counts the entries in the section and their size
+        """
+        entries = 0
+        size = 0
+        if os.path.isdir(self.directory()):
+            for entry in os.scandir(self.directory()):
+                if entry.is_file():
+                    entries += 1
+                    size += entry.stat().st_size
+        return {'entries': entries, 'size': size}
+
+    def clear(self):
+        shutil.rmtree(self.directory(), ignore_errors=True)
+
+    @classmethod
+    def sections(cls, root=None):
+        """
+        Finds the existing sections
+        """
+        root = root or cls.default_root()
+        if os.path.isdir(root):
+            return sorted(os.listdir(root))
+        return []
@@ -1,15 +1,32 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+import signal
+import sys
+
 import click
 
-from .app import App
 from .version import version as app_version
 
 
 class Cli:
 
+    """
+    The command line interface. Commands import the modules they need when
+    they run, so that starting up doesn't load the parser and the compiler
+    when they are not used.
+    """
+
     version_help = 'Prints Storyscript version'
     silent_help = 'Silent mode. Return syntax errors only.'
     ebnf_file_help = 'Load the grammar from a file. Useful for development'
+    jobs_help = 'Compile stories in parallel processes. 0 uses all cores'
+    watch_help = 'Compile stories again when they change'
+    socket_help = 'Path of the unix socket. Defaults to $STORYSCRIPT_SOCKET'
+    format_help = 'Output format of the tokens'
+    compact_help = 'Outputs JSON without indentation'
+    jsonl_help = 'Outputs JSON Lines, a story per line and then the services'
+    no_cache_help = 'Compiles all stories again, bypassing the cache'
 
     @click.group(invoke_without_command=True)
     @click.option('--version', is_flag=True, help=version_help)
@@ -33,33 +50,175 @@ class Cli:
     @click.option('--json', '-j', is_flag=True)
     @click.option('--silent', '-s', is_flag=True, help=silent_help)
     @click.option('--ebnf-file', help=ebnf_file_help)
-    def parse(storypath, output_file_path, json, silent, ebnf_file):
+    @click.option('--jobs', default=1, type=click.IntRange(min=0),
+                  help=jobs_help)
+    @click.option('--watch', '-w', is_flag=True, help=watch_help)
+    @click.option('--compact', is_flag=True, help=compact_help)
+    @click.option('--jsonl', is_flag=True, help=jsonl_help)
+    @click.option('--no-cache', is_flag=True, help=no_cache_help)
+    def parse(storypath, output_file_path, json, silent, ebnf_file, jobs,
+              watch, compact, jsonl, no_cache):
         """
-        Parses stories and prints the resulting json
+        Parses stories and prints the resulting json. Stories are written as
+        soon as they are compiled.
         """
-        results = App.compile(storypath, ebnf_file=ebnf_file)
+        from .output import Output
+        if no_cache:
+            os.environ['STORYSCRIPT_NO_CACHE'] = '1'
+        if watch:
+            if output_file_path is None:
+                raise click.UsageError('--watch requires an output file')
+            Cli.watch(storypath, output_file_path, silent, ebnf_file)
+            return
+        chunks = Cli.compile(storypath, ebnf_file, jobs, compact=compact,
+                             jsonl=jsonl)
+        stream = click.get_text_stream('stdout')
+        if json and not silent:
+            chunks = Cli.tee(chunks, stream)
+        if output_file_path:
+            Output.write(output_file_path, chunks)
+        else:
+            for _ in chunks:
+                pass
         if not silent:
             if json:
-                click.echo(results)
+                if not jsonl:
+                    stream.write('\n')
+                stream.flush()
             else:
                 click.echo(click.style('Script syntax passed!', fg='green'))
-        if output_file_path:
-            output_file = open(output_file_path, 'w')
-            output_file.write(results)
-            output_file.close()
+
+    @staticmethod
+    def tee(chunks, stream):
+        """
+        Writes chunks to a stream as they pass through
+        """
+        for chunk in chunks:
+            stream.write(chunk)
+            yield chunk
+
+    @staticmethod
+    def compile(storypath, ebnf_file, jobs, compact=False, jsonl=False):
+        """
+        Compiles stories through the daemon when it's running, or locally,
+        producing the output in chunks. The daemon is not used when the cache
+        is bypassed, as it has its own. When the daemon fails, for example on
+        a syntax error or when it runs another version or grammar, stories are
+        compiled locally, so that errors are raised as usual. The parser and
+        the compiler are loaded only when compiling locally.
+        """
+        from .cache import Cache
+        from .client import Client
+        from .exceptions import ServerError
+        client = Client(ebnf_file=ebnf_file)
+        if not Cache.disabled() and client.available():
+            try:
+                return [client.compile(storypath, jobs=jobs, compact=compact,
+                                       jsonl=jsonl)]
+            except (OSError, ServerError):
+                pass
+        from .app import App
+        return App.stream(storypath, ebnf_file=ebnf_file, jobs=jobs,
+                          compact=compact, jsonl=jsonl)
+
+    @staticmethod
+    def tokens(storypath):
+        """
+        Lexes stories through the daemon when it's running, or locally,
+        producing each story with its tokens. Stories are lexed locally when
+        the daemon fails, so that errors are raised as usual.
+        """
+        from .client import Client
+        from .exceptions import ServerError
+        client = Client()
+        if client.available():
+            try:
+                return client.lex(storypath).items()
+            except (OSError, ServerError):
+                pass
+        from .app import App
+        return App.lex(storypath)
+
+    @staticmethod
+    def watch(storypath, output_file_path, silent, ebnf_file):
+        """
+        Compiles stories when they change, printing the errors
+        """
+        from .app import App
+        watcher = App.watch(storypath, output_file_path, ebnf_file=ebnf_file)
+        for changed, errors in watcher:
+            for story, error in errors.items():
+                message = '{}: {}'.format(story, error)
+                click.echo(click.style(message, fg='red'))
+            if errors == {} and not silent:
+                message = 'Compiled {} stories'.format(len(changed))
+                click.echo(click.style(message, fg='green'))
+
+    @staticmethod
+    def lex_text(results):
+        """
+        Produces the tokens of each story as numbered lines
+        """
+        for file, tokens in results:
+            yield 'File: {}\n'.format(file)
+            for n, token in enumerate(tokens):
+                yield '{} {} {}\n'.format(n, token.type, token.value)
+
+    @staticmethod
+    def lex_json(results):
+        """
+        Produces a JSON object of the tokens of each story, as type and value
+        pairs, in chunks
+        """
+        yield '{'
+        separator = ''
+        for file, tokens in results:
+            yield '{}{}: ['.format(separator, json.dumps(file))
+            token_separator = ''
+            for token in tokens:
+                yield token_separator + json.dumps([token.type, token.value])
+                token_separator = ', '
+            yield ']'
+            separator = ', '
+        yield '}\n'
+
+    @staticmethod
+    def escape(value):
+        """
+        Escapes a TSV field, so that it holds no tabs or newlines
+        """
+        return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    @staticmethod
+    def lex_tsv(results):
+        """
+        Produces the tokens of each story as tab separated values, after a
+        header line
+        """
+        yield 'file\tindex\ttype\tvalue\n'
+        for file, tokens in results:
+            file = Cli.escape(file)
+            for n, token in enumerate(tokens):
+                yield '{}\t{}\t{}\t{}\n'.format(file, n, token.type,
+                                                Cli.escape(token.value))
 
     @staticmethod
     @main.command()
     @click.argument('storypath')
-    def lex(storypath):
+    @click.option('--format', default='text',
+                  type=click.Choice(['text', 'json', 'tsv']),
+                  help=format_help)
+    def lex(storypath, format):
         """
-        Shows lexer tokens for given stories
+        Shows lexer tokens for given stories. Tokens are written as they are
+        produced, through a buffered stream.
         """
-        results = App.lex(storypath)
-        for file, tokens in results.items():
-            click.echo('File: {}'.format(file))
-            for n, token in enumerate(tokens):
-                click.echo('{} {} {}'.format(n, token.type, token.value))
+        results = Cli.tokens(storypath)
+        stream = click.get_text_stream('stdout')
+        for chunk in getattr(Cli, 'lex_{}'.format(format))(results):
+            stream.write(chunk)
+        stream.flush()
 
     @staticmethod
     @main.command()
@@ -67,4 +226,53 @@ class Cli:
         """
         Prints the grammar specification
         """
-        click.echo(App.grammar())
+        from .parser import Grammar
+        click.echo(Grammar().build())
+
+    @staticmethod
+    @main.command()
+    @click.option('--socket', help=socket_help)
+    @click.option('--ebnf-file', help=ebnf_file_help)
+    def serve(socket, ebnf_file):
+        """
+        Starts a compile daemon, that the other commands use when running
+        """
+        from .server import Server
+        server = Server(socket, ebnf_file=ebnf_file)
+        click.echo('Listening on {}'.format(server.path))
+        if os.environ.get('STORYSCRIPT_SOCKET') != server.path:
+            message = 'Set STORYSCRIPT_SOCKET={} to forward commands to it'
+            click.echo(message.format(server.path))
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+    @main.group()
+    def cache():
+        """
+        Manages the cache
+        """
+
+    @staticmethod
+    @cache.command()
+    def stats():
+        """
+        Shows the cache entries and their size
+        """
+        from .app import App
+        for section, stats in App.cache_stats().items():
+            message = '{}: {} entries, {} bytes'
+            click.echo(message.format(section, stats['entries'],
+                                      stats['size']))
+
+    @staticmethod
+    @cache.command()
+    def clear():
+        """
+        Clears the cache
+        """
+        from .app import App
+        App.clear_cache()
+        click.echo('Cache cleared')
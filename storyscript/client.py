@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import stat
+from collections import namedtuple
+
+from .exceptions import ServerError, ServerMismatchError
+from .version import version
+
+
+LexToken = namedtuple('LexToken', ['type', 'value'])
+
+
+class Client:
+
+    """
+    Forwards requests to a running compile daemon. Forwarding is opt-in:
+    the daemon is used only when $STORYSCRIPT_SOCKET points to it. This
+    module doesn't import the parser nor the compiler, so that forwarded
+    commands start quickly.
+    """
+
+    def __init__(self, path=None, ebnf_file=None):
+        self.path = path or os.environ.get('STORYSCRIPT_SOCKET')
+        self.ebnf_file = ebnf_file
+
+    def available(self):
+        """
+        Whether the socket exists and belongs to the user, so that stories
+        are never sent to a socket created by someone else
+        """
+        if not self.path:
+            return False
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+    def request(self, command, **kwargs):
+        """
+        Sends a request, returning its result. Connection errors are raised
+        as OSError, while errors of the server as ServerError, or as
+        ServerMismatchError when the daemon can't compile like the client.
+        """
+        kwargs['command'] = command
+        kwargs['cwd'] = os.getcwd()
+        kwargs['version'] = version
+        kwargs['ebnf_file'] = None
+        if self.ebnf_file:
+            kwargs['ebnf_file'] = os.path.abspath(self.ebnf_file)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(self.path)
+            client.sendall(json.dumps(kwargs).encode('utf-8'))
+            client.shutdown(socket.SHUT_WR)
+            chunks = []
+            chunk = client.recv(65536)
+            while chunk:
+                chunks.append(chunk)
+                chunk = client.recv(65536)
+        response = json.loads(b''.join(chunks).decode('utf-8'))
+        if response.get('mismatch'):
+            raise ServerMismatchError(response['error'])
+        if 'error' in response:
+            raise ServerError(response['error'])
+        return response['result']
+
+    def compile(self, path, jobs=1, compact=False, jsonl=False):
+        return self.request('compile', path=path, jobs=jobs, compact=compact,
+                            jsonl=jsonl)
+
+    def lex(self, path):
+        results = {}
+        for story, tokens in self.request('lex', path=path).items():
+            results[story] = [LexToken(*token) for token in tokens]
+        return results
@@ -12,33 +12,34 @@ class Compiler:
     """
     def __init__(self):
         self.lines = {}
+        self.previous_line = None
+        self.conditionals = []
+        self.deferred = []
         self.services = []
         self.functions = {}
         self.outputs = {}
 
-    def sorted_lines(self):
-        return sorted(self.lines.keys(), key=lambda x: int(x))
-
     def last_line(self):
         """
         Gets the last line
         """
-        if self.lines:
-            return self.sorted_lines()[-1]
+        return self.previous_line
 
     def set_next_line(self, line_number):
         """
-        Finds the previous line, and set the current as its next line
+        Sets the current line as the next line of the previous one
         """
-        previous_line = self.last_line()
-        if previous_line:
-            self.lines[previous_line]['next'] = line_number
+        if self.previous_line:
+            self.lines[self.previous_line]['next'] = line_number
 
     def set_exit_line(self, line):
-        for line_number in self.sorted_lines()[::-1]:
-            if self.lines[line_number]['method'] in ['if', 'elif']:
-                self.lines[line_number]['exit'] = line
-                break
+        """
+        Sets the exit of the open if/elif to the given line, which becomes
+        the open line of the conditional chain
+        """
+        if self.conditionals:
+            self.lines[self.conditionals[-1]]['exit'] = line
+            self.conditionals[-1] = line
 
     @staticmethod
     def output(tree):
@@ -65,23 +66,22 @@ class Compiler:
                   function=None, output=None, enter=None, exit=None,
                   parent=None):
         """
-        Creates the base dictionary for a given line.
-        """
-        dictionary = {
-            line: {
-                'method': method,
-                'ln': line,
-                'output': output,
-                'service': service,
-                'command': command,
-                'function': function,
-                'args': args,
-                'enter': enter,
-                'exit': exit,
-                'parent': parent
-            }
+        Creates the base dictionary for a given line, appending it to the
+        lines table.
+        """
+        self.lines[line] = {
+            'method': method,
+            'ln': line,
+            'output': output,
+            'service': service,
+            'command': command,
+            'function': function,
+            'args': args,
+            'enter': enter,
+            'exit': exit,
+            'parent': parent
         }
-        self.lines = {**self.lines, **dictionary}
+        self.previous_line = line
 
     def add_line(self, method, line, **kwargs):
         if 'service' in kwargs:
@@ -123,7 +123,7 @@ class Compiler:
         line = tree.line()
         command = tree.node('service_fragment.command')
         if command:
-            command = command.child(0)
+            command = command.child(0).value
         arguments = Objects.arguments(tree.node('service_fragment'))
         service = tree.child(0).child(0).value
         output = self.output(tree.node('service_fragment.output'))
@@ -150,10 +150,13 @@ class Compiler:
                       parent=parent)
         self.subtree(nested_block, parent=line)
         trees = []
-        for block in [tree.node('elseif_block'), tree.node('else_block')]:
-            if block:
-                trees.append(block)
+        for block in tree.children:
+            if isinstance(block, Tree):
+                if block.data in ['elseif_block', 'else_block']:
+                    trees.append(block)
+        self.defer(self.conditionals.append, line)
         self.subtrees(*trees)
+        self.defer(self.conditionals.pop)
 
     def elseif_block(self, tree, parent=None):
         """
@@ -206,6 +209,26 @@ class Compiler:
         if nested_block:
             self.subtree(nested_block, parent=tree.line())
 
+    def defer(self, function, *args, **kwargs):
+        """
+        Schedules a function to run after the current one has finished, and
+        before what was scheduled earlier.
+        """
+        self.deferred.append((function, args, kwargs))
+
+    def run(self, function, *args, **kwargs):
+        """
+        Runs a function and, in order, everything it schedules. An explicit
+        stack is used instead of recursion, so that blocks can be nested at
+        any depth.
+        """
+        stack = [(function, args, kwargs)]
+        while stack:
+            function, args, kwargs = stack.pop()
+            self.deferred = []
+            function(*args, **kwargs)
+            stack.extend(reversed(self.deferred))
+
     def subtrees(self, *trees):
         """
         Parses many subtrees
@@ -215,16 +238,16 @@ class Compiler:
 
     def subtree(self, tree, parent=None):
         """
-        Parses a subtree, checking whether it should be compiled directly
+        Schedules a subtree, checking whether it should be compiled directly
         or keep parsing for deeper trees.
         """
         allowed_nodes = ['service_block', 'assignment', 'if_block',
                          'elseif_block', 'else_block', 'foreach_block',
                          'function_block', 'return_statement', 'arguments']
         if tree.data in allowed_nodes:
-            getattr(self, tree.data)(tree, parent=parent)
+            self.defer(getattr(self, tree.data), tree, parent=parent)
             return
-        self.parse_tree(tree, parent=parent)
+        self.defer(self.parse_tree, tree, parent=parent)
 
     def parse_tree(self, tree, parent=None):
         """
@@ -247,6 +270,6 @@ class Compiler:
     @classmethod
     def compile(cls, tree):
         compiler = cls.compiler()
-        compiler.parse_tree(tree)
+        compiler.run(compiler.parse_tree, tree)
         return {'tree': compiler.lines, 'services': compiler.get_services(),
                 'functions': compiler.functions, 'version': version}
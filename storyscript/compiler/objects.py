@@ -46,19 +46,11 @@ class Objects:
 
     @classmethod
     def list(cls, tree):
-        items = []
-        for value in tree.children:
-            items.append(cls.values(value))
-        return {'$OBJECT': 'list', 'items': items}
+        return cls.values(Tree('values', [tree]))
 
     @classmethod
     def objects(cls, tree):
-        items = []
-        for item in tree.children:
-            key = cls.string(item.node('string'))
-            value = cls.values(item.child(1))
-            items.append([key, value])
-        return {'$OBJECT': 'dict', 'items': items}
+        return cls.values(Tree('values', [tree]))
 
     @staticmethod
     def types(tree):
@@ -84,7 +76,36 @@ class Objects:
     @classmethod
     def values(cls, tree):
         """
-        Parses a values subtree
+        Parses a values subtree. Lists and objects are filled in using an
+        explicit stack instead of recursion, so that they can be nested at
+        any depth.
+        """
+        result = [None]
+        stack = [(tree, result, 0)]
+        while stack:
+            tree, container, index = stack.pop()
+            subtree = tree.child(0)
+            data = getattr(subtree, 'data', None)
+            if data == 'list':
+                items = [None] * len(subtree.children)
+                container[index] = {'$OBJECT': 'list', 'items': items}
+                for position, value in enumerate(subtree.children):
+                    stack.append((value, items, position))
+            elif data == 'objects':
+                items = []
+                container[index] = {'$OBJECT': 'dict', 'items': items}
+                for item in subtree.children:
+                    pair = [cls.string(item.node('string')), None]
+                    items.append(pair)
+                    stack.append((item.child(1), pair, 1))
+            else:
+                container[index] = cls.value(tree)
+        return result[0]
+
+    @classmethod
+    def value(cls, tree):
+        """
+        Parses a values subtree that is not a list or an object
         """
         subtree = tree.child(0)
         if hasattr(subtree, 'data'):
@@ -92,12 +113,8 @@ class Objects:
                 return cls.string(subtree)
             elif subtree.data == 'boolean':
                 return cls.boolean(subtree)
-            elif subtree.data == 'list':
-                return cls.list(subtree)
             elif subtree.data == 'number':
                 return cls.number(subtree)
-            elif subtree.data == 'objects':
-                return cls.objects(subtree)
             elif subtree.data == 'types':
                 return cls.types(subtree)
             elif subtree.data == 'path':
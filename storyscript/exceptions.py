@@ -37,3 +37,18 @@ class StoryscriptSyntaxError(SyntaxError):
         message = '"{}" not allowed at line {}, column {}.\n\n> {}'
         return message.format(self.item, self.item.line, self.item.column,
                               self.reason())
+
+
+class ServerError(Exception):
+
+    """
+    Raised by the client when the compile daemon fails to handle a request.
+    """
+
+
+class ServerMismatchError(ServerError):
+
+    """
+    Raised by the client when the compile daemon runs another version of
+    storyscript, or uses another grammar.
+    """
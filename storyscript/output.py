@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+
+class Output:
+
+    """
+    Writes compiled stories. It doesn't import the parser nor the compiler,
+    so that output from the compile daemon is written without loading them.
+    """
+
+    @staticmethod
+    def write(path, chunks):
+        """
+        Writes chunks of content to a file atomically, so that readers never
+        see a partial file, even when producing a chunk fails
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        os.replace(temporary, path)
@@ -1,10 +1,44 @@
+# -*- coding: utf-8 -*-
+import importlib
+import sys
+import types
+
 from .ebnf import Ebnf
 from .grammar import Grammar
-from .indenter import CustomIndenter
-from .parser import Parser
-from .transformer import Transformer
-from .tree import Tree
 
 
-__all__ = ['CustomIndenter', 'Ebnf', 'Grammar', 'Parser', 'Transformer',
-           'Tree']
+lazy_classes = {
+    'CustomIndenter': 'indenter',
+    'FastLexer': 'lexer',
+    'Parser': 'parser',
+    'Tables': 'tables',
+    'Transformer': 'transformer',
+    'Tree': 'tree'
+}
+
+
+class Package(types.ModuleType):
+
+    """
+    The parser package. Ebnf and Grammar are plain Python, while the other
+    classes need lark: they are imported when first accessed, so that
+    building the grammar doesn't load lark. Python 3.6 has no module
+    __getattr__, so the package module gets this class instead.
+    """
+
+    def __getattr__(self, name):
+        if name not in lazy_classes:
+            message = 'module {!r} has no attribute {!r}'
+            raise AttributeError(message.format(self.__name__, name))
+        module = importlib.import_module('.{}'.format(lazy_classes[name]),
+                                         self.__name__)
+        value = getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+
+sys.modules[__name__].__class__ = Package
+
+
+__all__ = ['CustomIndenter', 'Ebnf', 'FastLexer', 'Grammar', 'Parser',
+           'Tables', 'Transformer', 'Tree']
@@ -269,7 +269,13 @@ class Grammar:
         self.ebnf.rules('types', *definitions)
 
     def comment(self):
-        token = '/(?<=###)\s(.*|\\n)+(?=\s###)|#(.*)/'
+        """
+        Comments start with #. Block comments start with a line holding
+        ###, and end at the next ###. Closing markers are consumed by the
+        block and openers are preceded by whitespace, so that comments are
+        lexed in linear time.
+        """
+        token = r'/(?<![^\s])###[ \t]*\n[\s\S]*?\s###.*|#(.*)/'
         self.ebnf.token('comment', token, regexp=True)
         self.ebnf.rule('comment', 'COMMENT+', raw=True)
 
@@ -9,3 +9,13 @@ class CustomIndenter(Indenter):
     INDENT_type = '_INDENT'
     DEDENT_type = '_DEDENT'
     tab_len = 8
+
+    def process(self, stream):
+        """
+        Resets the indentation levels before processing a stream, so that the
+        same indenter can be reused by a cached parser, even after a stream
+        that failed.
+        """
+        self.paren_level = 0
+        self.indent_level = [0]
+        return super().process(stream)
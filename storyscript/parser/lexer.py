@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import re
+
+from lark.lexer import Lexer, Token, UnexpectedInput
+
+
+class FastLexer:
+    """
+    A hand-written lexer, producing the same tokens as Lark's lexer followed
+    by the indenter. All the tokens are matched by a single master regex,
+    keywords are looked up once a name has been matched, and indentation is
+    tracked while scanning instead of by a separate postlexer.
+    """
+
+    def __init__(self, tokens, ignore=(), indenter=None):
+        lexer = Lexer(tokens, ignore=ignore)
+        definitions = {token.name: token for token in tokens}
+        self.regex = re.compile('|'.join(
+            '(?P<{}>{})'.format(token.name, token.pattern.to_regexp())
+            for token in lexer.tokens))
+        self.newline_types = set(lexer.newline_types)
+        self.ignore_types = set(lexer.ignore_types)
+        self.keywords = {}
+        for type_, callback in lexer.callback.items():
+            keywords = {}
+            for mre, types in callback.mres:
+                for name in types.values():
+                    definition = definitions[name]
+                    keywords[definition.pattern.value] = name
+                    assert not definition.pattern.flags, name
+            self.keywords[type_] = keywords
+        self.indenter = indenter
+        self.plain = set(self.regex.groupindex) - self.special()
+
+    def special(self):
+        """
+        Finds the token types that need more than being matched
+        """
+        special = self.newline_types | self.ignore_types | set(self.keywords)
+        if self.indenter:
+            special.add(self.indenter.NL_type)
+            special.update(self.indenter.OPEN_PAREN_types)
+            special.update(self.indenter.CLOSE_PAREN_types)
+        return special
+
+    def indent(self, token, levels):
+        """
+        Yields the indentation tokens that follow a newline token, updating
+        the indentation levels.
+        """
+        indent_str = token.value[token.value.rindex('\n') + 1:]
+        tabs = indent_str.count('\t') * self.indenter.tab_len
+        indent = indent_str.count(' ') + tabs
+        if indent > levels[-1]:
+            levels.append(indent)
+            yield Token.new_borrow_pos(self.indenter.INDENT_type, indent_str,
+                                       token)
+            return
+        while indent < levels[-1]:
+            levels.pop()
+            yield Token.new_borrow_pos(self.indenter.DEDENT_type, indent_str,
+                                       token)
+        assert indent == levels[-1], '%s != %s' % (indent, levels[-1])
+
+    def lex(self, text):
+        """
+        Lexes the text, yielding tokens as they are matched. Tokens are
+        created setting their attributes directly, which is faster than going
+        through the constructor of Lark's tokens. Most tokens are plain, and
+        skip the checks for keywords, newlines and indentation.
+        """
+        match = self.regex.match
+        keywords = self.keywords
+        newline_types = self.newline_types
+        ignore_types = self.ignore_types
+        nl_type = None
+        opening = closing = ()
+        levels = [0]
+        parens = 0
+        if self.indenter:
+            nl_type = self.indenter.NL_type
+            opening = self.indenter.OPEN_PAREN_types
+            closing = self.indenter.CLOSE_PAREN_types
+        plain = self.plain
+        new = str.__new__
+        length = len(text)
+        position = 0
+        line = 1
+        line_start = 0
+        while position < length:
+            m = match(text, position)
+            if m is None:
+                raise UnexpectedInput(text, position, line,
+                                      position - line_start)
+            type_ = m.lastgroup
+            value = m.group()
+            start = position
+            position = m.end()
+            if type_ in plain:
+                token = new(Token, value)
+                token.type = type_
+                token.value = value
+                token.pos_in_stream = start
+                token.line = line
+                token.column = start - line_start
+                token.end_line = line
+                token.end_column = position - line_start
+                yield token
+                continue
+            if type_ in keywords:
+                type_ = keywords[type_].get(value, type_)
+            token_line = line
+            column = start - line_start
+            if type_ in newline_types:
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = start + value.rindex('\n') + 1
+            if type_ in ignore_types:
+                continue
+            token = new(Token, value)
+            token.type = type_
+            token.value = value
+            token.pos_in_stream = start
+            token.line = token_line
+            token.column = column
+            token.end_line = line
+            token.end_column = position - line_start
+            if type_ == nl_type:
+                if parens == 0:
+                    yield token
+                    yield from self.indent(token, levels)
+                continue
+            yield token
+            if type_ in opening:
+                parens += 1
+            elif type_ in closing:
+                parens -= 1
+                assert parens >= 0
+        if self.indenter:
+            while len(levels) > 1:
+                levels.pop()
+                yield Token(self.indenter.DEDENT_type, '')
@@ -1,20 +1,82 @@
 # -*- coding: utf-8 -*-
-from lark import Lark
+import hashlib
+
+from lark import Lark, __version__ as lark_version
 from lark.common import UnexpectedToken
 
 from .grammar import Grammar
 from .indenter import CustomIndenter
+from .tables import Tables
 from .transformer import Transformer
+from ..cache import Cache
+from ..version import version
+
+try:
+    from . import standalone
+except ImportError:
+    standalone = None
 
 
 class Parser:
     """
     Wraps up the parser submodule and exposes parsing and lexing
-    functionalities.
+    functionalities. LALR parsers can use the 'fast' hand-written lexer
+    instead of Lark's standard one.
     """
-    def __init__(self, algo='lalr', ebnf_file=None):
+    cache = {}
+    default_grammar = None
+    fingerprint = None
+
+    def __init__(self, algo='lalr', ebnf_file=None, lexer='standard'):
         self.algo = algo
         self.ebnf_file = ebnf_file
+        self.lexer = lexer
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Empties the parsers cache, so that the next parser is built again from
+        its grammar. Useful when developing a grammar with ebnf_file.
+        """
+        cls.cache.clear()
+        cls.default_grammar = None
+
+    @staticmethod
+    def grammar_hash(grammar):
+        """
+        Hashes a grammar string
+        """
+        return hashlib.sha256(grammar.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def tables_fingerprint(cls):
+        """
+        Hashes the sources of the modules that dump and load the tables, so
+        that cached tables are not used after their format changed. It's empty
+        when the sources can't be read, and tables are then not cached.
+        """
+        if cls.fingerprint is None:
+            resources = ['lexer.py', 'tables.py']
+            fingerprint = Cache.fingerprint(__package__, resources)
+            cls.fingerprint = fingerprint or ''
+        return cls.fingerprint
+
+    def uses_standalone(self):
+        """
+        Whether the standalone module can be used instead of the grammar. The
+        module must have been generated with the installed version of lark.
+        """
+        if standalone and self.ebnf_file is None and self.algo == 'lalr':
+            return getattr(standalone, 'lark_version', None) == lark_version
+        return False
+
+    def checksum(self):
+        """
+        Hashes the grammar used by this parser
+        """
+        if self.uses_standalone():
+            return standalone.grammar_hash
+        return self.grammar_hash(self.grammar())
 
     def indenter(self):
         """
@@ -29,24 +91,82 @@ class Parser:
         return Transformer()
 
     def grammar(self):
+        """
+        Gets the grammar from the ebnf file, or builds the default grammar.
+        The default grammar can't change, so it's built only once.
+        """
         if self.ebnf_file:
             with open(self.ebnf_file, 'r') as f:
                 return f.read()
-        return Grammar().build()
+        if Parser.default_grammar is None:
+            Parser.default_grammar = Grammar().build()
+        return Parser.default_grammar
+
+    def build(self, grammar, grammar_hash):
+        """
+        Initializes Lark. For LALR, the analysed tables are loaded from the
+        disk cache when available, and stored there otherwise. LALR parsers
+        apply the transformer while parsing.
+        """
+        if self.algo != 'lalr':
+            return Lark(grammar, parser=self.algo, postlex=self.indenter())
+        fingerprint = self.tables_fingerprint()
+        cache = Cache('tables')
+        key = Cache.key(grammar_hash, version, lark_version, fingerprint)
+        data = None
+        if fingerprint:
+            data = cache.get(key)
+        if data is None:
+            lark = Lark(grammar, parser=self.algo, postlex=self.indenter())
+            data = Tables.dump(lark)
+            if fingerprint:
+                cache.set(key, data)
+        return Tables(data, postlex=self.indenter(),
+                      transformer=self.transformer(), lexer=self.lexer)
+
+    def generate(self, path):
+        """
+        Writes the standalone module, that holds the tables for the grammar
+        and is used instead of building the grammar at runtime.
+        """
+        grammar = self.grammar()
+        lark = Lark(grammar, parser='lalr', postlex=self.indenter())
+        source = Tables.source(Tables.dump(lark), self.grammar_hash(grammar))
+        with open(path, 'w') as f:
+            f.write(source)
 
     def lark(self):
         """
-        Get the grammar and initialize Lark.
+        Get the grammar and initialize Lark. Parsers are cached by grammar,
+        algorithm, ebnf file and lexer, so that they are built only once per
+        process. When available, the standalone module is used for the default
+        grammar.
         """
-        return Lark(self.grammar(), parser=self.algo, postlex=self.indenter())
+        if self.uses_standalone():
+            key = (standalone.grammar_hash, self.algo, self.ebnf_file,
+                   self.lexer)
+            if key not in self.cache:
+                self.cache[key] = Tables(standalone.tables,
+                                         postlex=self.indenter(),
+                                         transformer=self.transformer(),
+                                         lexer=self.lexer)
+            return self.cache[key]
+        grammar = self.grammar()
+        grammar_hash = self.grammar_hash(grammar)
+        key = (grammar_hash, self.algo, self.ebnf_file, self.lexer)
+        if key not in self.cache:
+            self.cache[key] = self.build(grammar, grammar_hash)
+        return self.cache[key]
 
     def parse(self, source):
         """
-        Parses the source string.
+        Parses the source string. LALR parsers produce the transformed tree
+        directly, while other algorithms transform it after parsing.
         """
         source = '{}\n'.format(source)
-        lark = self.lark()
-        tree = lark.parse(source)
+        tree = self.lark().parse(source)
+        if self.algo == 'lalr':
+            return tree
         return self.transformer().transform(tree)
 
     def lex(self, source):
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+from pprint import pformat
+
+from lark import __version__ as lark_version
+from lark.common import PatternRE, PatternStr, TokenDef
+from lark.grammar import Rule, RuleOptions
+from lark.lexer import Lexer
+from lark.parse_tree_builder import ParseTreeBuilder
+from lark.parsers.lalr_analysis import ParseTable, Reduce, Shift
+from lark.parsers.lalr_parser import _Parser
+from lark.tree import Tree
+
+from .lexer import FastLexer
+from .tree import Tree as StoryscriptTree
+
+
+class Tables:
+    """
+    Holds the analysed LALR tables and the lexer definitions of a parser as
+    plain data, so that they can be stored and loaded again without having
+    to analyse the grammar. When a transformer is given, it's applied while
+    parsing, instead of building a Lark tree first. The 'fast' lexer replaces
+    both Lark's lexer and the postlexer, that must then be an indenter.
+    """
+
+    patterns = {'str': PatternStr, 're': PatternRE}
+
+    def __init__(self, data, postlex=None, transformer=None,
+                 lexer='standard'):
+        self.data = data
+        self.postlex = postlex
+        self.transformer = transformer
+        self.rules = [self.rule(*rule) for rule in data['rules']]
+        if lexer == 'fast':
+            self.lexer = FastLexer(self.tokens(), ignore=data['ignore'],
+                                   indenter=postlex)
+            self.postlex = None
+        else:
+            self.lexer = Lexer(self.tokens(), ignore=data['ignore'])
+        self.parser = _Parser(self.parse_table(), self.callbacks())
+
+    @classmethod
+    def token(cls, name, pattern, value, flags, priority):
+        pattern = cls.patterns[pattern](value, flags)
+        return TokenDef(name, pattern, priority=priority)
+
+    def tokens(self):
+        return [self.token(*token) for token in self.data['tokens']]
+
+    @staticmethod
+    def rule(origin, expansion, alias, options):
+        if options is not None:
+            options = RuleOptions(*options)
+        return Rule(origin, list(expansion), alias=alias, options=options)
+
+    def parse_table(self):
+        """
+        Rebuilds the parse table, replacing reductions indexes with rules.
+        """
+        states = {}
+        for state, actions in self.data['states'].items():
+            states[state] = {}
+            for token, (action, argument) in actions.items():
+                if action:
+                    states[state][token] = (Reduce, self.rules[argument])
+                else:
+                    states[state][token] = (Shift, argument)
+        return ParseTable(states, self.data['start'], self.data['end'])
+
+    def callbacks(self):
+        """
+        Creates the tree building callbacks for each rule, using the
+        transformer methods when there is one. Storyscript trees get their
+        positions while they are built.
+        """
+        builder = ParseTreeBuilder(self.rules, Tree)
+        callback = builder.create_callback(self.transformer)
+        callbacks = {}
+        for rule in self.rules:
+            function = getattr(callback, rule.alias or rule.origin)
+            callbacks[rule] = StoryscriptTree.positioned(function)
+        return callbacks
+
+    @staticmethod
+    def dump_token(token):
+        pattern = 're'
+        if isinstance(token.pattern, PatternStr):
+            pattern = 'str'
+        return (token.name, pattern, token.pattern.value,
+                tuple(sorted(token.pattern.flags)), token.priority)
+
+    @staticmethod
+    def dump_rule(rule, alias):
+        options = None
+        if rule.options:
+            options = (rule.options.keep_all_tokens, rule.options.expand1,
+                       rule.options.create_token, rule.options.filter_out,
+                       rule.options.priority)
+        return (rule.origin, tuple(rule.expansion), alias, options)
+
+    @classmethod
+    def dump(cls, lark):
+        """
+        Dumps the tables of a LALR Lark instance to plain data.
+        """
+        aliases = lark._parse_tree_builder.user_aliases
+        rules = {}
+        for index, rule in enumerate(lark.rules):
+            rules[rule] = index
+        parse_table = lark.parser.parser.analysis.parse_table
+        states = {}
+        for state, actions in parse_table.states.items():
+            states[state] = {}
+            for token, (action, argument) in actions.items():
+                if action is Reduce:
+                    states[state][token] = (1, rules[argument])
+                else:
+                    states[state][token] = (0, argument)
+        return {
+            'tokens': [cls.dump_token(token) for token in
+                       lark.lexer_conf.tokens],
+            'ignore': list(lark.lexer_conf.ignore),
+            'rules': [cls.dump_rule(rule, aliases[rule]) for rule in
+                      lark.rules],
+            'states': states,
+            'start': parse_table.start_state,
+            'end': parse_table.end_state
+        }
+
+    @staticmethod
+    def source(data, grammar_hash):
+        """
+        Produces the source of a standalone module holding the tables.
+        """
+        header = ('# -*- coding: utf-8 -*-\n'
+                  '# Generated by storyscript from its grammar, '
+                  'using lark {}. Do not edit.\n')
+        body = 'lark_version = {!r}\ngrammar_hash = {!r}\n\ntables = {}\n'
+        return header.format(lark_version) + body.format(
+            lark_version, grammar_hash, pformat(data))
+
+    def lex(self, text):
+        stream = self.lexer.lex(text)
+        if self.postlex:
+            return self.postlex.process(stream)
+        return stream
+
+    def parse(self, text):
+        return self.parser.parse(self.lex(text))
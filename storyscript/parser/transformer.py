@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
+from functools import partial
 
 from lark import Transformer as LarkTransformer
 
@@ -13,8 +14,25 @@ class Transformer(LarkTransformer):
     Performs transformations on the tree before it's parsed.
     All trees are transformed to Storyscript's custom tree. In some cases,
     additional transformations or checks are performed.
+
+    Each rule is dispatched through a table of constructors, filled the
+    first time a rule is seen. LALR tables look each of their rules up once,
+    when the parsing callbacks are created.
     """
 
+    def __init__(self):
+        self.constructors = {}
+
+    def constructor(self, rule):
+        """
+        Gets the function that transforms a rule: either a method that
+        performs additional checks, or the Tree constructor.
+        """
+        method = getattr(self, rule, None)
+        if method:
+            return method
+        return partial(Tree, rule)
+
     def arguments(self, matches):
         """
         Transform an argument tree. If dealing with is a short-hand argument,
@@ -38,5 +56,11 @@ class Transformer(LarkTransformer):
             raise StoryscriptSyntaxError(3, token)
         return Tree('assignment', matches)
 
-    def __getattr__(self, attribute, *args):
-        return lambda matches: Tree(attribute, matches)
+    def _get_func(self, name):
+        """
+        Gets the constructor of a rule, adding it to the table when it's
+        missing.
+        """
+        if name not in self.constructors:
+            self.constructors[name] = self.constructor(name)
+        return self.constructors[name]
@@ -7,18 +7,108 @@ from ..version import version
 
 class Tree(LarkTree):
 
+    """
+    Storyscript's tree. When built by the parser, trees hold their position
+    as a (line, column, end_line, end_column) tuple, where columns start
+    from zero and the end is right after the last character.
+    """
+    paths = {}
+    index_width = 8
+    layout = ('_NL', '_INDENT', '_DEDENT', '_WS')
+    position = None
+    _index = (None, None)
+
+    @classmethod
+    def item_position(cls, item):
+        """
+        Gets the position of a token or a tree. Layout tokens have none.
+        """
+        if isinstance(item, Tree):
+            return item.position
+        if isinstance(item, Token):
+            if item.type in cls.layout or item.line is None:
+                return None
+            newlines = item.value.count('\n')
+            if newlines:
+                end_column = len(item.value) - item.value.rfind('\n') - 1
+            else:
+                end_column = item.column + len(item.value)
+            return (item.line, item.column, item.line + newlines, end_column)
+
+    @classmethod
+    def span(cls, items):
+        """
+        Finds the position spanning from the first to the last item
+        """
+        for item in items:
+            start = cls.item_position(item)
+            if start:
+                break
+        else:
+            return None
+        for item in reversed(items):
+            end = cls.item_position(item)
+            if end:
+                return (start[0], start[1], end[2], end[3])
+
+    @classmethod
+    def positioned(cls, builder):
+        """
+        Wraps a tree builder of the parser, so that the trees it builds get
+        the position of the items they are built from, including the tokens
+        that are filtered out of the tree.
+        """
+        def build(items):
+            result = builder(items)
+            if isinstance(result, cls) and result.position is None:
+                result.position = cls.span(items)
+            return result
+        return build
+
+    def index(self):
+        """
+        Indexes the first subtree of each kind among the children. The index
+        is built on the first lookup, and again if children are replaced.
+        """
+        children, subtrees = self._index
+        if children is not self.children:
+            subtrees = {}
+            for item in reversed(self.children):
+                if isinstance(item, Tree):
+                    subtrees[item.data] = item
+            self._index = (self.children, subtrees)
+        return subtrees
+
     @staticmethod
     def walk(tree, path):
-        for item in tree.children:
-            if isinstance(item, Tree):
-                if item.data == path:
+        """
+        Finds the first subtree named path among the children. Only trees
+        with at least index_width children use the index: narrow trees, most
+        of the trees the compiler looks into, are scanned, since that's
+        faster than building their index.
+        """
+        children = tree.children
+        if len(children) < Tree.index_width:
+            for item in children:
+                if isinstance(item, Tree) and item.data == path:
                     return item
+            return None
+        return tree.index().get(path)
+
+    @classmethod
+    def shards(cls, path):
+        """
+        Splits a path, caching the result
+        """
+        if path not in cls.paths:
+            cls.paths[path] = tuple(path.split('.'))
+        return cls.paths[path]
 
     def node(self, path):
         """
         Finds a subtree or a nested subtree, using path
         """
-        shards = path.split('.')
+        shards = self.paths.get(path) or self.shards(path)
         current = None
         for shard in shards:
             if current is None:
@@ -33,10 +123,22 @@ class Tree(LarkTree):
 
     def line(self):
         """
-        Finds the line number of a tree, by finding the first token in the tree
-        and returning its line
+        Gets the line number of a tree. Trees built without a position find
+        it from the first token in the tree.
         """
-        for child in self.children:
+        tree = self
+        while tree.position is None:
+            if not tree.children:
+                return None
+            child = tree.children[0]
             if isinstance(child, Token):
                 return str(child.line)
-            return child.line()
+            tree = child
+        return str(tree.position[0])
+
+    def end_line(self):
+        """
+        Gets the line where a tree built by the parser ends
+        """
+        if self.position:
+            return str(self.position[2])
@@ -1,15 +1,153 @@
 # -*- coding: utf-8 -*-
+import operator
 import re
-from functools import reduce
+from collections import OrderedDict
+from functools import partial
+from string import Formatter
+
+
+class Plan:
+    """
+    A resolution plan, made ahead of time from a compiled object. Resolving
+    a plan against some data doesn't look at the object anymore.
+    """
+
+    __slots__ = ()
+
+
+class Constant(Plan):
+
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+    def resolve(self, data):
+        return self.value
+
+
+class Path(Plan):
+
+    __slots__ = ('access', )
+
+    def __init__(self, access):
+        self.access = access
+
+    def resolve(self, data):
+        return self.access(data)
+
+
+class Format(Plan):
+    """
+    Formats a string with its values, as for strings and files with values
+    """
+
+    __slots__ = ('string', 'values')
+
+    def __init__(self, string, values):
+        self.string = string
+        self.values = values
+
+    def resolve(self, data):
+        return self.string.format(*[value.resolve(data)
+                                    for value in self.values])
+
+
+class Expression(Plan):
+
+    __slots__ = ('function', 'values')
+
+    def __init__(self, function, values):
+        self.function = function
+        self.values = values
+
+    def resolve(self, data):
+        return self.function(*[value.resolve(data) for value in self.values])
+
+
+class Method(Plan):
+
+    __slots__ = ('operator', 'left', 'right')
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def resolve(self, data):
+        return self.operator(self.left.resolve(data), self.right.resolve(data))
+
+
+class Dictionary(Plan):
+    """
+    Resolves the values of a dictionary, keeping its keys
+    """
+
+    __slots__ = ('items', )
+
+    def __init__(self, items):
+        self.items = items
+
+    def resolve(self, data):
+        return {key: value.resolve(data) for key, value in self.items}
+
+
+class Pairs(Plan):
+    """
+    Resolves both the keys and the values of a dict object
+    """
+
+    __slots__ = ('items', )
+
+    def __init__(self, items):
+        self.items = items
+
+    def resolve(self, data):
+        result = {}
+        for key, value in self.items:
+            key = key.resolve(data)
+            if key not in (list, tuple, dict):
+                result[key] = value.resolve(data)
+        return result
+
+
+class List(Plan):
+
+    __slots__ = ('items', )
+
+    def __init__(self, items):
+        self.items = items
+
+    def resolve(self, data):
+        return [item.resolve(data) for item in self.items]
+
+
+class Words(Plan):
+    """
+    Joins the items of a list with spaces, except when the list is made
+    of a single boolean, as Resolver.list does.
+    """
+
+    __slots__ = ('items', )
+
+    def __init__(self, items):
+        self.items = items
+
+    def resolve(self, data):
+        result = [item.resolve(data) for item in self.items]
+        if len(result) == 1:
+            if type(result[0]) is bool:
+                return result
+        return ' '.join(result)
 
 
 class Resolver:
 
-    @staticmethod
-    def _walk(item, index):
-        if index.isdigit():
-            return item[int(index)]
-        return item[index]
+    expressions = {}
+    accessors = {}
+    regexes = OrderedDict()
+    regexes_size = 1024
+    regex_counters = {'hits': 0, 'misses': 0}
 
     @classmethod
     def handside(cls, item, data):
@@ -49,16 +187,46 @@ class Resolver:
             return filename.format(*values)
         return filename
 
+    @staticmethod
+    def compile_path(paths):
+        """
+        Compiles a path to a function getting it from some data. Segments
+        made of digits are converted to list indexes in advance.
+        """
+        segments = tuple(int(segment) if segment.isdigit() else segment
+                         for segment in paths)
+
+        def access(data):
+            try:
+                for segment in segments:
+                    data = data[segment]
+            except (KeyError, TypeError):
+                return None
+            return data
+        return access
+
+    @classmethod
+    def path_accessor(cls, paths):
+        """
+        Gets the function of a path, compiling it only the first time
+        """
+        key = tuple(paths)
+        accessor = cls.accessors.get(key)
+        if accessor is None:
+            accessor = cls.compile_path(key)
+            cls.accessors[key] = accessor
+        return accessor
+
     @classmethod
     def path(cls, paths, data):
         """
         Resolves a path against some data, for example the path ['a', 'b']
         with data {'a': {'b': 'value'}} produces 'value'
         """
-        try:
-            return reduce(cls._walk, paths, data)
-        except (KeyError, TypeError):
-            return None
+        accessor = cls.accessors.get(tuple(paths))
+        if accessor is None:
+            accessor = cls.path_accessor(paths)
+        return accessor(data)
 
     @classmethod
     def argument(cls, argument, data):
@@ -76,28 +244,130 @@ class Resolver:
         for item in items:
             yield cls.resolve(item, data)
 
+    operators = {
+        'like': lambda left, right: Resolver.like(left, right),
+        'notlike': lambda left, right: not Resolver.like(left, right),
+        'in': lambda left, right: left in right,
+        'has': lambda left, right: right in left,
+        'contains': lambda left, right: right in left,
+        'excludes': lambda left, right: left not in right,
+        'isnt': lambda left, right: right != left,
+        'is': lambda left, right: right == left
+    }
+
+    comparisons = {
+        '{} == {}': operator.eq,
+        '{} != {}': operator.ne,
+        '{} < {}': operator.lt,
+        '{} <= {}': operator.le,
+        '{} > {}': operator.gt,
+        '{} >= {}': operator.ge
+    }
+
+    @classmethod
+    def regex(cls, pattern):
+        """
+        Gets the compiled regex of a pattern, from a cache that keeps the
+        most recently used ones.
+        """
+        regex = cls.regexes.get(pattern)
+        if regex is None:
+            cls.regex_counters['misses'] += 1
+            regex = re.compile(pattern)
+            cls.regexes[pattern] = regex
+            if len(cls.regexes) > cls.regexes_size:
+                cls.regexes.popitem(last=False)
+            return regex
+        cls.regex_counters['hits'] += 1
+        cls.regexes.move_to_end(pattern)
+        return regex
+
+    @classmethod
+    def regex_stats(cls):
+        """
+        Describes the use of the regex cache
+        """
+        return dict(cls.regex_counters, entries=len(cls.regexes),
+                    size=cls.regexes_size)
+
+    @classmethod
+    def clear_regexes(cls):
+        cls.regexes.clear()
+        cls.regex_counters.update(hits=0, misses=0)
+
+    @classmethod
+    def like(cls, left, right):
+        """
+        Matches a value against a regex, or against a pattern which is
+        compiled through the regex cache.
+        """
+        if type(right) is str:
+            right = cls.regex(right)
+        return right.match(left) is not None
+
+    @classmethod
+    def method(cls, method, left, right):
+        operator = cls.operators.get(method)
+        if operator is None:
+            raise ValueError('Method not supported')
+        return operator(left, right)
+
     @staticmethod
-    def method(method, left, right):
-        if method == 'like':
-            return right.match(left) is not None
-        elif method == 'notlike':
-            return right.match(left) is None
-        elif method == 'in':
-            return left in right
-        elif method in ('has', 'contains'):
-            return right in left
-        elif method == 'excludes':
-            return left not in right
-        elif method == 'isnt':
-            return right != left
-        elif method == 'is':
-            return right == left
-        raise ValueError('Method not supported')
+    def translate(expression):
+        """
+        Translates an expression to the source of a function, that takes the
+        values of the expression as arguments. Returns None for expressions
+        whose fields are more than plain positions, like '{0.real}'.
+        """
+        body = []
+        arguments = 0
+        position = 0
+        for literal, field, spec, conversion in Formatter().parse(expression):
+            body.append(literal)
+            if field is None:
+                continue
+            if spec or conversion:
+                return None
+            if field == '':
+                index = position
+                position += 1
+            elif field.isdigit():
+                index = int(field)
+            else:
+                return None
+            body.append('_{}'.format(index))
+            arguments = max(arguments, index + 1)
+        names = ['_{}'.format(index) for index in range(arguments)]
+        return 'lambda {}: ({})'.format(', '.join(names + ['*_']),
+                                        ''.join(body))
+
+    @classmethod
+    def compile_expression(cls, expression):
+        """
+        Compiles an expression to a function of its values. Expressions that
+        can't be translated are formatted with their values and evaluated.
+        """
+        source = cls.translate(expression)
+        if source is None:
+            return lambda *values: eval(
+                expression.format(*map(cls.stringify, values)))
+        return eval(source, globals())
+
+    @classmethod
+    def expression_function(cls, expression):
+        """
+        Gets the function of an expression, compiling it only the first time
+        """
+        function = cls.expressions.get(expression)
+        if function is None:
+            function = cls.compile_expression(expression)
+            cls.expressions[expression] = function
+        return function
 
     @classmethod
     def expression(cls, data, expression, values):
-        mapping = map(cls.stringify, cls.values(values, data=data))
-        return eval(expression.format(*mapping))
+        function = cls.expression_function(expression)
+        return function(*cls.values(values, data=data))
 
     @classmethod
     def object(cls, item, data):
@@ -113,7 +383,7 @@ class Resolver:
         elif object_type == 'path':
             return cls.path(item['paths'], data)
         elif object_type == 'regexp':
-            return re.compile(item['regexp'])
+            return cls.regex(item['regexp'])
         elif object_type == 'value':
             return item['value']
         elif object_type == 'method':
@@ -152,6 +422,76 @@ class Resolver:
                 return result
         return ' '.join(result)
 
+    @classmethod
+    def compile_values(cls, values):
+        return tuple(cls.compile(value) for value in values)
+
+    @classmethod
+    def compile_object(cls, item):
+        """
+        Makes the plan of an object, following the same dispatch as
+        Resolver.object
+        """
+        object_type = item.get('$OBJECT')
+        if object_type in ('string', 'file'):
+            if item.get('values'):
+                values = cls.compile_values(item['values'])
+                return Format(item['string'], values)
+            return Constant(item['string'])
+        elif object_type == 'path':
+            return Path(cls.path_accessor(item['paths']))
+        elif object_type == 'regexp':
+            return Constant(cls.regex(item['regexp']))
+        elif object_type == 'value':
+            return Constant(item['value'])
+        elif object_type == 'method':
+            method = item['method']
+            function = cls.operators.get(method, partial(cls.method, method))
+            left = cls.compile_object(item['left'])
+            right = cls.compile_object(item['right'])
+            if method in ('like', 'notlike') and type(right) is Constant:
+                if type(right.value) is str:
+                    right = Constant(cls.regex(right.value))
+            return Method(function, left, right)
+        elif object_type == 'expression':
+            values = cls.compile_values(item['values'])
+            comparison = cls.comparisons.get(item['expression'])
+            if comparison and len(values) == 2:
+                return Method(comparison, values[0], values[1])
+            function = cls.expression_function(item['expression'])
+            return Expression(function, values)
+        elif object_type == 'argument':
+            return cls.compile_object(item['argument'])
+        elif object_type == 'dict':
+            return Pairs(tuple((cls.compile_object(key),
+                                cls.compile_object(value))
+                               for key, value in item['items']))
+        elif object_type == 'list':
+            return List(cls.compile_values(item['items']))
+        return Dictionary(tuple((key, cls.compile(value))
+                                for key, value in item.items()))
+
+    @classmethod
+    def compile(cls, item):
+        """
+        Compiles an item to a plan, that can be resolved against any data
+        giving the same result as Resolver.resolve
+        """
+        if type(item) is dict:
+            return cls.compile_object(item)
+        elif type(item) is list:
+            return Words(cls.compile_values(item))
+        return Constant(item)
+
+    @classmethod
+    def resolve_many(cls, item, contexts):
+        """
+        Resolves an item against each of the contexts, compiling it only
+        once
+        """
+        resolve = cls.compile(item).resolve
+        return [resolve(data) for data in contexts]
+
     @classmethod
     def resolve(cls, item, data):
         if type(item) is dict:
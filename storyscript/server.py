@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+
+from .app import App
+from .exceptions import ServerError
+from .parser import Parser
+from .version import version
+
+
+def socket_directory():
+    """
+    Finds the private directory holding the socket of the user, in the
+    runtime directory or in the temporary one
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, 'storyscript-{}'.format(os.getuid()))
+
+
+def default_socket():
+    """
+    Finds the socket path, from $STORYSCRIPT_SOCKET or in the private
+    directory of the user
+    """
+    if os.environ.get('STORYSCRIPT_SOCKET'):
+        return os.environ['STORYSCRIPT_SOCKET']
+    return os.path.join(socket_directory(), 'daemon.sock')
+
+
+def private_directory(directory):
+    """
+    Creates a directory that only the user can access. An existing directory
+    is refused when it belongs to someone else or others can access it.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    private = info.st_uid == os.getuid() and not info.st_mode & 0o077
+    if not stat.S_ISDIR(info.st_mode) or not private:
+        raise ServerError('Insecure socket directory {}'.format(directory))
+
+
+def stale_socket(path):
+    """
+    Whether a path holds a socket that nothing listens on anymore, left
+    behind by a daemon that didn't shut down cleanly
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(info.st_mode):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return True
+    return False
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.read().decode('utf-8'))
+        except ValueError:
+            response = {'error': 'Invalid request'}
+        else:
+            response = self.server.respond(request)
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+
+
+class Server(socketserver.UnixStreamServer):
+
+    """
+    A compile daemon, listening on a unix socket. It keeps the parser and
+    the compile cache loaded, and answers a JSON request per connection.
+    Requests are handled one at a time, as the parser is not thread-safe.
+    """
+
+    def __init__(self, path=None, ebnf_file=None):
+        self.path = path or default_socket()
+        self.ebnf_file = None
+        if ebnf_file:
+            self.ebnf_file = os.path.abspath(ebnf_file)
+        if path is None and not os.environ.get('STORYSCRIPT_SOCKET'):
+            private_directory(os.path.dirname(self.path))
+        if os.path.lexists(self.path):
+            if not stale_socket(self.path):
+                message = '{} is in use or is not a socket'
+                raise ServerError(message.format(self.path))
+            os.remove(self.path)
+        super().__init__(self.path, Handler)
+        os.chmod(self.path, 0o600)
+        App.preload(ebnf_file=self.ebnf_file)
+
+    def compile(self, request):
+        if 'source' in request:
+            return App.compile_source(request['source'],
+                                      ebnf_file=self.ebnf_file)
+        return App.compile(request['path'], ebnf_file=self.ebnf_file,
+                           jobs=request.get('jobs', 1),
+                           compact=request.get('compact', False),
+                           jsonl=request.get('jsonl', False))
+
+    def lex(self, request):
+        if 'source' in request:
+            parser = Parser(ebnf_file=self.ebnf_file)
+            results = [('source', parser.lex(request['source']))]
+        else:
+            results = App.lex(request['path'])
+        tokens = {}
+        for story, story_tokens in results:
+            tokens[story] = [[token.type, token.value] for token in
+                             story_tokens]
+        return tokens
+
+    def parse(self, request):
+        source = request.get('source')
+        if source is None:
+            source = App.read_story(request['path'])
+        return Parser(ebnf_file=self.ebnf_file).parse(source).pretty()
+
+    def mismatch(self, request):
+        """
+        Checks the version and the grammar a request asks for, when given,
+        returning an error when they are not the ones of the daemon
+        """
+        if request.get('version', version) != version:
+            message = 'The daemon runs storyscript {}'
+            return {'error': message.format(version), 'mismatch': True}
+        if request.get('ebnf_file', self.ebnf_file) != self.ebnf_file:
+            message = 'The daemon uses the grammar {}'
+            return {'error': message.format(self.ebnf_file or 'default'),
+                    'mismatch': True}
+        return None
+
+    def respond(self, request):
+        """
+        Runs the command of a request. Paths are relative to the working
+        directory of the client.
+        """
+        command = request.get('command')
+        if command not in ('compile', 'lex', 'parse'):
+            return {'error': 'Unknown command {}'.format(command)}
+        mismatch = self.mismatch(request)
+        if mismatch:
+            return mismatch
+        try:
+            if 'cwd' in request:
+                os.chdir(request['cwd'])
+            return {'result': getattr(self, command)(request)}
+        except Exception as error:
+            return {'error': '{}: {}'.format(type(error).__name__, error)}
+
+    def server_close(self):
+        """
+        Closes the server and removes its socket, unless another daemon
+        listens on it by now
+        """
+        super().server_close()
+        if stale_socket(self.path):
+            os.remove(self.path)
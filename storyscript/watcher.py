@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+
+class Inotify:
+
+    """
+    Minimal inotify bindings, used to sleep until something changes in the
+    watched directories instead of polling them.
+    """
+
+    # IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO,
+    # IN_CREATE, IN_DELETE, IN_DELETE_SELF
+    mask = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400
+
+    def __init__(self):
+        self.libc = self.load()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    @staticmethod
+    def load():
+        library = ctypes.util.find_library('c')
+        return ctypes.CDLL(library, use_errno=True)
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            return hasattr(cls.load(), 'inotify_init1')
+        except OSError:
+            return False
+
+    def add(self, directory):
+        """
+        Watches a directory. Watching it again has no effect.
+        """
+        self.libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                    self.mask)
+
+    def drain(self):
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout=None):
+        """
+        Waits for events, returning whether any arrived before the timeout.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        self.drain()
+        return bool(readable)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+
+    """
+    Watches a path for stories whose files changed, using inotify where
+    available and polling otherwise. Changes are detected by comparing the
+    modification time and size of the files found by the given finder.
+    """
+
+    def __init__(self, path, finder, interval=0.5):
+        self.path = path
+        self.finder = finder
+        self.interval = interval
+        self.inotify = None
+        if Inotify.available():
+            self.inotify = Inotify()
+
+    def snapshot(self):
+        snapshot = {}
+        for story in self.finder(self.path):
+            try:
+                stat = os.stat(story)
+            except OSError:
+                continue
+            snapshot[story] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def directories(self):
+        if os.path.isdir(self.path):
+            for root, subdirs, files in os.walk(self.path):
+                yield root
+        else:
+            yield os.path.dirname(self.path) or '.'
+
+    def add_watches(self):
+        if self.inotify:
+            for directory in self.directories():
+                self.inotify.add(directory)
+
+    def wait(self):
+        """
+        Sleeps until something changes. Directories are watched again every
+        time, so that new subdirectories are picked up.
+        """
+        if self.inotify is None:
+            time.sleep(self.interval)
+            return
+        self.add_watches()
+        if self.inotify.wait():
+            # NOTE: editors often save in many steps, so wait for them
+            # to settle before looking at the files.
+            time.sleep(0.05)
+            self.inotify.drain()
+
+    def changes(self, previous, current):
+        """
+        Finds the changed and the removed stories between snapshots
+        """
+        changed = []
+        for story, stat in current.items():
+            if previous.get(story) != stat:
+                changed.append(story)
+        removed = []
+        for story in previous:
+            if story not in current:
+                removed.append(story)
+        return changed, removed
+
+    def watch(self):
+        """
+        Yields the changed and the removed stories every time something
+        changes. All stories are considered changed the first time.
+        """
+        self.add_watches()
+        snapshot = self.snapshot()
+        try:
+            yield list(snapshot), []
+            while True:
+                self.wait()
+                current = self.snapshot()
+                changed, removed = self.changes(snapshot, current)
+                snapshot = current
+                if changed or removed:
+                    yield changed, removed
+        finally:
+            if self.inotify:
+                self.inotify.close()
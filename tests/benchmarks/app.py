@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from pytest import mark
+
+from storyscript.app import App
+
+
+pytestmark = mark.benchmark
+
+
+def test_app_compile_sources_throughput(best_time):
+    """
+    Ensures in-memory sources compile at hundreds of stories per second
+    """
+    story = 'alpine echo text:"{0}"\nif x == {0}\n    y = {0}\n'
+    sources = {}
+    for number in range(300):
+        sources['{}.story'.format(number)] = story.format(number)
+    App.compile_sources({'warm.story': 'x = 1'})
+    speed = len(sources) / best_time(App.compile_sources, sources)
+    print('compile_sources: {:.0f} stories/s'.format(speed))
+    assert speed > 200
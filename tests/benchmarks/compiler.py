@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from pytest import mark
+
+from storyscript.compiler import Compiler
+from storyscript.parser import Parser
+
+
+pytestmark = mark.benchmark
+
+
+def story(statements):
+    line = 'x{0} = {0}\nalpine echo text:"{0}"\n'
+    return ''.join(line.format(number) for number in range(statements))
+
+
+@mark.parametrize('factor', [8])
+def test_compiler_scaling(best_time, factor):
+    """
+    Ensures compile time grows linearly with the number of lines
+    """
+    small = Parser().parse(story(500))
+    large = Parser().parse(story(500 * factor))
+    ratio = best_time(Compiler.compile, large) / best_time(Compiler.compile,
+                                                           small)
+    assert ratio < factor * 2.5
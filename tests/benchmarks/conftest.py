@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import time
+
+from pytest import fixture
+
+
+@fixture(autouse=True)
+def cache_home(monkeypatch, tmpdir):
+    """
+    Keeps the persistent cache out of the user's home
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+
+
+@fixture
+def best_time():
+    """
+    Returns the best of a few timed runs of a function
+    """
+    def timer(function, *args, repeat=3):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(*args)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    return timer
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import sys
+
+from pytest import fixture, mark
+
+from storyscript.parser import Parser
+
+
+pytestmark = mark.benchmark
+
+
+@fixture(scope='module')
+def lexer():
+    parser = Parser()
+    parser.lark()
+    return parser
+
+
+@fixture(scope='module')
+def fast_lexer():
+    parser = Parser(lexer='fast')
+    parser.lark()
+    return parser
+
+
+def lex(parser, source):
+    for _ in parser.lex(source):
+        pass
+
+
+def test_lexer_block_comment(best_time, lexer):
+    """
+    Ensures a block comment of a few megabytes is lexed quickly
+    """
+    source = '###\n{}###\na = 1\n'.format(' commented = out\n' * 200000)
+    assert len(source) > 3000000
+    assert best_time(lex, lexer, source) < 1
+
+
+@mark.parametrize('line', ['# a = 1\n', 'x###\n', '   ###\n'])
+def test_lexer_unterminated_comment_scaling(best_time, lexer, line):
+    """
+    Ensures lexing what follows an unterminated block comment grows linearly
+    """
+    factor = 4
+    small = '###\n{}'.format(line * 5000)
+    large = '###\n{}'.format(line * 5000 * factor)
+    ratio = best_time(lex, lexer, large) / best_time(lex, lexer, small)
+    assert ratio < factor * 2.5
+
+
+@mark.skipif(sys.gettrace() is not None,
+             reason='tracing slows down the fast lexer, but not lark')
+def test_lexer_throughput(best_time, lexer, fast_lexer):
+    """
+    Measures the megabytes lexed per second by both lexers
+    """
+    story = ('alpine echo text:"hello" as output\n    message:"hi"\n'
+             'if a == 1\n    b = [1,2,3]\n# note\nc = {"d":true}\n')
+    source = story * 5000
+    megabytes = len(source) / 1000000
+    standard = megabytes / best_time(lex, lexer, source)
+    fast = megabytes / best_time(lex, fast_lexer, source)
+    print('lark: {:.2f} MB/s, fast: {:.2f} MB/s'.format(standard, fast))
+    assert fast > standard
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import re
+from functools import reduce
+
+from pytest import mark
+
+from storyscript.resolver import Resolver
+
+
+pytestmark = mark.benchmark
+
+
+class EvalResolver(Resolver):
+    """
+    Formats and evaluates expressions on each resolution, as the resolver
+    used to do.
+    """
+
+    @classmethod
+    def expression(cls, data, expression, values):
+        mapping = map(cls.stringify, cls.values(values, data=data))
+        return eval(expression.format(*mapping))
+
+
+class ReduceResolver(Resolver):
+    """
+    Walks paths with reduce, classifying each segment on each resolution, as
+    the resolver used to do.
+    """
+
+    @staticmethod
+    def _walk(item, index):
+        if index.isdigit():
+            return item[int(index)]
+        return item[index]
+
+    @classmethod
+    def path(cls, paths, data):
+        try:
+            return reduce(cls._walk, paths, data)
+        except (KeyError, TypeError):
+            return None
+
+
+class RecompileResolver(Resolver):
+    """
+    Compiles regexes with re.compile on each resolution, as the resolver used
+    to do.
+    """
+
+    @classmethod
+    def regex(cls, pattern):
+        return re.compile(pattern)
+
+
+def evaluate(resolver, item, contexts):
+    for data in contexts:
+        resolver.resolve(item, data)
+
+
+def test_resolver_expression_throughput(best_time):
+    """
+    Compares the expressions evaluated per second by compiled functions and
+    by evaluating the formatted expressions
+    """
+    item = {'$OBJECT': 'expression', 'expression': '{} == {}',
+            'values': [{'$OBJECT': 'path', 'paths': ['a', 'b']},
+                       {'$OBJECT': 'string', 'string': 'value'}]}
+    contexts = [{'a': {'b': 'value{}'.format(n % 2)}} for n in range(5000)]
+    speed = len(contexts) / best_time(evaluate, Resolver, item, contexts)
+    reference = len(contexts) / best_time(evaluate, EvalResolver, item,
+                                          contexts)
+    print('compiled: {:.0f}/s, eval: {:.0f}/s'.format(speed, reference))
+    assert speed > reference * 2
+
+
+def evaluate_items(resolver, items):
+    for item in items:
+        resolver.resolve(item, None)
+
+
+def resolve_paths(resolver, paths, data):
+    for _ in range(20):
+        for path in paths:
+            resolver.path(path, data)
+
+
+def access_paths(accessors, data):
+    for _ in range(20):
+        for access in accessors:
+            access(data)
+
+
+def test_resolver_path_throughput(best_time):
+    """
+    Compares the paths resolved per second by compiled accessors and by
+    walking paths with reduce
+    """
+    data = {}
+    paths = [['missing', 'name']]
+    for n in range(300):
+        data['service{}'.format(n)] = {'items': [{'name': n}]}
+        paths.append(['service{}'.format(n), 'items', '0', 'name'])
+    accessors = [Resolver.path_accessor(path) for path in paths]
+    count = len(paths) * 20
+    cached = count / best_time(resolve_paths, Resolver, paths, data)
+    speed = count / best_time(access_paths, accessors, data)
+    reference = count / best_time(resolve_paths, ReduceResolver, paths, data)
+    message = 'accessors: {:.0f}/s, path: {:.0f}/s, reduce: {:.0f}/s'
+    print(message.format(speed, cached, reference))
+    assert speed > reference * 1.5
+    assert cached > reference
+
+
+def resolve_plan(plan, contexts):
+    for data in contexts:
+        plan.resolve(data)
+
+
+def test_resolver_plan_throughput(best_time):
+    """
+    Compares the objects resolved per second by a plan and by resolving the
+    object each time
+    """
+    item = [{'$OBJECT': 'method', 'method': 'is',
+             'left': {'$OBJECT': 'path', 'paths': ['a', 'b']},
+             'right': {'$OBJECT': 'value', 'value': 1}}]
+    item = {'$OBJECT': 'dict', 'items': [
+        [{'$OBJECT': 'string', 'string': 'condition'},
+         {'$OBJECT': 'argument', 'argument': item[0]}],
+        [{'$OBJECT': 'string', 'string': 'text'},
+         {'$OBJECT': 'string', 'string': 'b is {}',
+          'values': [{'$OBJECT': 'path', 'paths': ['a', 'b']}]}]]}
+    contexts = [{'a': {'b': n % 2}} for n in range(5000)]
+    plan = Resolver.compile(item)
+    speed = len(contexts) / best_time(resolve_plan, plan, contexts)
+    reference = len(contexts) / best_time(evaluate, Resolver, item, contexts)
+    print('plan: {:.0f}/s, resolve: {:.0f}/s'.format(speed, reference))
+    assert speed > reference * 1.5
+
+
+def test_resolver_resolve_many_throughput(best_time):
+    """
+    Compares the contexts resolved per second by a batch, that compiles the
+    item only once, and by resolving them one by one
+    """
+    item = {'$OBJECT': 'expression', 'expression': '{} > {}',
+            'values': [{'$OBJECT': 'path', 'paths': ['a', 'b']},
+                       {'$OBJECT': 'value', 'value': 1}]}
+    contexts = [{'a': {'b': n % 3}} for n in range(5000)]
+    speed = len(contexts) / best_time(Resolver.resolve_many, item, contexts)
+    reference = len(contexts) / best_time(evaluate, Resolver, item, contexts)
+    print('batch: {:.0f}/s, resolve: {:.0f}/s'.format(speed, reference))
+    assert speed > reference * 2
+
+
+def test_resolver_regex_throughput(best_time):
+    """
+    Compares the regexp objects resolved per second through the regex cache
+    and through re.compile, with more patterns than the re module caches
+    """
+    items = [{'$OBJECT': 'regexp', 'regexp': '^item{}$'.format(n)}
+             for n in range(800)]
+    [Resolver.resolve(item, None) for item in items]
+    speed = len(items) / best_time(evaluate_items, Resolver, items)
+    reference = len(items) / best_time(evaluate_items, RecompileResolver,
+                                       items)
+    print('cached: {:.0f}/s, re: {:.0f}/s'.format(speed, reference))
+    assert Resolver.regex_stats()['hits'] >= len(items)
+    assert speed > reference * 2
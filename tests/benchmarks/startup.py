@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import threading
+
+from pytest import fixture, mark
+
+import storyscript
+from storyscript.server import Server
+
+
+pytestmark = [mark.benchmark,
+              mark.skipif(sys.version_info < (3, 7),
+                          reason='-X importtime needs Python 3.7')]
+
+
+budget = 0.1
+heavy = ('lark', 'multiprocessing', 'storyscript.app', 'storyscript.compiler',
+         'storyscript.resolver', 'storyscript.server')
+
+
+@fixture
+def daemon(request, monkeypatch, tmpdir):
+    """
+    Runs a compile daemon, that commands are forwarded to
+    """
+    server = Server(str(tmpdir.join('test.sock')))
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.01})
+    thread.start()
+
+    def teardown():
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    request.addfinalizer(teardown)
+    monkeypatch.setenv('STORYSCRIPT_SOCKET', server.path)
+
+
+def import_times(*args):
+    """
+    Runs the command line interface with -X importtime, returning the
+    cumulative import time of each module in seconds
+    """
+    root = os.path.dirname(os.path.dirname(storyscript.__file__))
+    env = dict(os.environ, PYTHONPATH=root)
+    code = 'from storyscript.cli import Cli; Cli.main({!r})'.format(args)
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            fields = line[len('import time:'):].split('|')
+            if fields[1].strip().isdigit():
+                times[fields[2].strip()] = int(fields[1]) / 1000000
+    return times
+
+
+def test_startup_budget():
+    """
+    Ensures importing the command line interface stays within budget
+    """
+    times = import_times('--version')
+    print('storyscript.cli: {:.3f}s'.format(times['storyscript.cli']))
+    assert times['storyscript.cli'] < budget
+
+
+@mark.parametrize('args, allowed', [
+    (['--version'], ()),
+    (['grammar'], ()),
+    (['cache', 'stats'], ('lark', 'multiprocessing', 'storyscript.app',
+                          'storyscript.compiler'))
+])
+def test_startup_modules(args, allowed):
+    """
+    Ensures commands don't import the modules they don't use
+    """
+    times = import_times(*args)
+    assert 'storyscript.cli' in times
+    for module in times:
+        if module.startswith(heavy):
+            assert module.startswith(allowed)
+
+
+def test_startup_forwarded(daemon, tmpdir):
+    """
+    Ensures commands forwarded to the daemon load neither the parser nor
+    the compiler
+    """
+    story = tmpdir.join('one.story')
+    story.write('a = 1\n')
+    times = import_times('parse', str(story))
+    assert 'storyscript.client' in times
+    for module in times:
+        assert not module.startswith(heavy)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from pytest import fixture, mark
+
+from storyscript.parser import Parser, Tables, Transformer, Tree
+
+
+pytestmark = mark.benchmark
+
+
+class LambdaTransformer(Transformer):
+    """
+    Dispatches rules by creating a function on each lookup, as the
+    transformer used to do.
+    """
+
+    def _get_func(self, name):
+        return getattr(self, name)
+
+    def __getattr__(self, attribute):
+        return lambda matches: Tree(attribute, matches)
+
+
+@fixture(scope='module')
+def tree():
+    """
+    Parses a large story without transforming it
+    """
+    line = 'x{0} = [{0}, {0}]\ny = {{"a":{0}}}\nalpine echo text:"{0}"\n'
+    source = ''.join(line.format(number) for number in range(2000))
+    parser = Parser()
+    tables = Tables(parser.lark().data, postlex=parser.indenter())
+    return tables.parse('{}\n'.format(source))
+
+
+def test_transformer_throughput(best_time, tree):
+    """
+    Ensures the dispatch table transforms more nodes per second than
+    creating a function for each node
+    """
+    nodes = sum(1 for _ in tree.iter_subtrees())
+    speed = nodes / best_time(Transformer().transform, tree)
+    reference = nodes / best_time(LambdaTransformer().transform, tree)
+    print('transform: {:.0f} nodes/s, lambdas: {:.0f} nodes/s'.format(
+        speed, reference))
+    assert speed > reference
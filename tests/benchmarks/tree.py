@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from pytest import fixture, mark
+
+from storyscript.parser import Parser, Tree
+
+
+pytestmark = mark.benchmark
+
+
+def linear_node(tree, path):
+    """
+    Finds a nested subtree by scanning children, as Tree.node used to do
+    """
+    current = None
+    for shard in path.split('.'):
+        for item in (current or tree).children:
+            if isinstance(item, Tree) and item.data == shard:
+                current = item
+                break
+    return current
+
+
+@fixture(scope='module')
+def story():
+    """
+    Parses a statement-heavy story, made of services with many arguments
+    """
+    arguments = ' '.join('key{0}:{0}'.format(number) for number in range(20))
+    line = 'alpine echo {} as output\n'.format(arguments)
+    return Parser().parse(line * 1000)
+
+
+def lookups(node, services):
+    for service in services:
+        for path in ['service_fragment', 'service_fragment.command',
+                     'service_fragment.output']:
+            node(service, path)
+
+
+def test_tree_node_lookups(best_time, story):
+    """
+    Ensures indexed lookups are faster than scanning the children of wide
+    statements
+    """
+    services = list(story.find_data('service'))
+    indexed = best_time(lookups, Tree.node, services)
+    linear = best_time(lookups, linear_node, services)
+    assert indexed < linear
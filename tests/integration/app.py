@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+from pytest import fixture
+
+import storyscript
+from storyscript.app import App
+from storyscript.cache import Cache
+from storyscript.parser import Parser
+
+
+@fixture
+def stories(tmpdir):
+    for number in range(8):
+        story = 'alpine echo text:"{}"\nif x == {}\n    y = slack post\n'
+        tmpdir.join('{}.story'.format(number)).write(story.format(number,
+                                                                  number))
+    return str(tmpdir)
+
+
+def test_app_compile_jobs(stories):
+    """
+    Ensures parallel compilation produces the same output as sequential
+    """
+    assert App.compile(stories, jobs=2) == App.compile(stories)
+
+
+def test_app_compile_cached(mocker, stories):
+    """
+    Ensures unchanged stories are not parsed again
+    """
+    result = App.compile(stories)
+    mocker.patch.object(Parser, 'parse')
+    assert App.compile(stories) == result
+    assert Parser.parse.call_count == 0
+
+
+def test_app_compile_compiler_changed(mocker, stories):
+    """
+    Ensures stories are compiled again when the compiler changes
+    """
+    App.compile(stories)
+    mocker.patch.object(App, 'fingerprint', 'changed')
+    mocker.spy(Parser, 'parse')
+    App.compile(stories)
+    assert Parser.parse.call_count == 8
+
+
+def test_app_compile_no_cache(mocker, monkeypatch, stories):
+    App.compile(stories)
+    monkeypatch.setenv('STORYSCRIPT_NO_CACHE', '1')
+    mocker.spy(Parser, 'parse')
+    App.compile(stories)
+    assert Parser.parse.call_count == 8
+
+
+def test_app_compile_compact(stories):
+    result = App.compile(stories, compact=True)
+    assert '\n' not in result
+    assert json.loads(result) == json.loads(App.compile(stories))
+
+
+def test_app_compile_jsonl(stories):
+    """
+    Ensures JSON Lines hold the same stories and services, also when
+    compiling in parallel
+    """
+    lines = App.compile(stories, jsonl=True).splitlines()
+    assert App.compile(stories, jobs=2, jsonl=True).splitlines() == lines
+    expected = json.loads(App.compile(stories))
+    records = [json.loads(line) for line in lines]
+    stories = {record['story']: record['compiled'] for record in records[:-1]}
+    assert stories == expected['stories']
+    assert records[-1] == {'services': expected['services']}
+
+
+def test_app_compile_dict(stories):
+    assert App.compile_dict(stories) == json.loads(App.compile(stories))
+
+
+def test_app_compile_sources(mocker, stories):
+    """
+    Ensures sources compile to the same structure as the stories on disk,
+    without reading nor caching them
+    """
+    sources = {}
+    for story in App.get_stories(stories):
+        sources[story] = App.read_story(story)
+    expected = App.compile_dict(stories)
+    mocker.patch.object(App, 'read_story')
+    mocker.patch.object(Cache, 'set')
+    assert App.compile_sources(sources) == expected
+    assert App.read_story.call_count == 0
+    assert Cache.set.call_count == 0
+
+
+def test_app_compile_source_unpicklable():
+    """
+    Ensures stories that are too deep to pickle are compiled anyway and
+    leave nothing behind in the cache
+    """
+    source = 'x = {}1{}\n'.format('[' * 300, ']' * 300)
+    assert App.compile_source(source)['tree']
+    assert Cache('stories').stats()['entries'] == 0
+
+
+def test_app_compile_source_zipped(tmpdir):
+    """
+    Ensures stories are compiled and cached when storyscript is imported
+    from a zip file
+    """
+    package = os.path.dirname(os.path.abspath(storyscript.__file__))
+    archive = str(tmpdir.join('storyscript.zip'))
+    with zipfile.ZipFile(archive, 'w') as file:
+        for directory, names, files in os.walk(package):
+            for name in files:
+                if name.endswith('.py'):
+                    path = os.path.join(directory, name)
+                    relative = os.path.relpath(path, os.path.dirname(package))
+                    file.write(path, relative)
+    script = ('from storyscript.app import App\n'
+              'assert App.compiler_fingerprint()\n'
+              'assert App.compile_source("x = 1")["tree"]\n'
+              'print(App.compile_source.__code__.co_filename)\n')
+    env = dict(os.environ, PYTHONPATH=archive)
+    output = subprocess.check_output([sys.executable, '-c', script],
+                                     env=env, cwd=str(tmpdir))
+    assert output.decode().startswith(archive)
+    assert Cache('stories').stats()['entries'] == 1
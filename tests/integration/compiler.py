@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from lark.lexer import Token
+
+from storyscript.compiler import Compiler
+from storyscript.parser import Parser, Tree
+
+
+def assignment(line, fragment):
+    """
+    Builds the tree of an assignment, as the parser would
+    """
+    path = Tree('path', [Token('NAME', 'x', line=line)])
+    return Tree('block', [Tree('line', [Tree('assignment',
+                                             [path, fragment])])])
+
+
+def test_compiler_exit_lines():
+    """
+    Ensures each if/elif exits to the next block of its own chain
+    """
+    source = ('if a\n    if b\n        x = 1\n    y = 1\n'
+              'else if c\n    x = 2\nelse if d\n    x = 3\n')
+    lines = Compiler.compile(Parser().parse(source))['tree']
+    assert lines['1']['exit'] == '5'
+    assert lines['2']['exit'] is None
+    assert lines['5']['exit'] == '7'
+    assert lines['7']['method'] == 'elif'
+
+
+def test_compiler_else_line():
+    source = 'if a\n    x = 1\nelse\n    x = 2\n'
+    lines = Compiler.compile(Parser().parse(source))['tree']
+    assert lines['1']['exit'] == '3'
+    assert lines['3']['method'] == 'else'
+    assert lines['3']['enter'] == '4'
+    assert lines['4']['parent'] == '3'
+
+
+def test_compiler_nested_blocks():
+    """
+    Ensures blocks nested deeper than the recursion limit are compiled
+    """
+    depth = 2000
+    lines = ['{}if x\n'.format('  ' * level) for level in range(depth)]
+    source = '{}{}y = 1\n'.format(''.join(lines), '  ' * depth)
+    result = Compiler.compile(Parser().parse(source))['tree']
+    assert len(result) == depth + 1
+    assert result[str(depth + 1)]['parent'] == str(depth)
+    assert result['1']['next'] == '2'
+
+
+def test_compiler_nested_values():
+    depth = 3000
+    source = 'x = {}1{}\n'.format('[' * depth, ']' * depth)
+    result = Compiler.compile(Parser().parse(source))['tree']
+    value = result['1']['args'][1]
+    for _ in range(depth):
+        value = value['items'][0]
+    assert value == 1
+
+
+def test_compiler_long_story():
+    """
+    Compiles a story of a hundred thousand lines, building its tree directly
+    since parsing it is much slower than compiling it
+    """
+    size = 100000
+    number = Tree('number', [Token('INT', '1')])
+    fragment = Tree('assignment_fragment', [Token('EQUALS', '='),
+                                            Tree('values', [number])])
+    lines = [assignment(line, fragment) for line in range(1, size + 1)]
+    result = Compiler.compile(Tree('start', lines))['tree']
+    assert len(result) == size
+    assert result['1']['next'] == '2'
+    assert result[str(size)]['args'][1] == 1
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from pytest import fixture
+
+
+@fixture(autouse=True)
+def cache_home(monkeypatch, tmpdir):
+    """
+    Keeps the persistent cache out of the user's home
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
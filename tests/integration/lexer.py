@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import ast
+import os
+
+from pytest import mark
+
+from storyscript.parser import Parser
+
+
+def string(node):
+    """
+    Gets the value of a string literal. Python 3.7 and older parse strings
+    to Str nodes, and newer versions to Constant nodes.
+    """
+    if type(node).__name__ == 'Str':
+        return node.s
+    if type(node).__name__ == 'Constant' and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def corpus():
+    """
+    Collects the sources used by the integration tests, together with some
+    cases that are hard on a lexer.
+    """
+    sources = ['', 'a', '\n\n\n', 'x = 1', '\tif a\n\t\tb\n', 'a\n  b\n c\n',
+               'if a\n    b\n\n\n  \nc\n', 'a = $', '###\n a\n###\nb\n',
+               '###\nnot closed\n', 'if a\n\tb\n        c\nd\n',
+               'a = "multi\nline"\nb = 1\n']
+    folder = os.path.dirname(__file__)
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.py'):
+            with open(os.path.join(folder, name)) as f:
+                module = ast.parse(f.read())
+            for node in ast.walk(module):
+                value = string(node)
+                if value and '\n' in value:
+                    sources.append(value)
+    return sources
+
+
+def tokens(parser, source):
+    """
+    Lexes a source, describing each token by all its attributes, or by the
+    exception raised when lexing it.
+    """
+    try:
+        result = list(parser.lex(source))
+    except Exception as error:
+        return type(error), str(error)
+    return [(token.type, token.value, token.pos_in_stream, token.line,
+             token.column, getattr(token, 'end_line', None),
+             getattr(token, 'end_column', None)) for token in result]
+
+
+def test_lexer_corpus_size():
+    assert len(corpus()) > 50
+
+
+@mark.parametrize('source', corpus())
+def test_lexer_fast(source):
+    """
+    Ensures the fast lexer produces the same tokens as Lark's lexer
+    """
+    standard = Parser()
+    fast = Parser(lexer='fast')
+    assert tokens(fast, source) == tokens(standard, source)
+    source = '{}\n'.format(source)
+    assert tokens(fast, source) == tokens(standard, source)
+
+
+def test_lexer_fast_parse():
+    source = ('if a\n    x = [1,{"b":true}]\nelse\n    alpine echo '
+              'text:"hello" as output\n        message:"hi"\n')
+    assert Parser(lexer='fast').parse(source) == Parser().parse(source)
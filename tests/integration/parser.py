@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
+from lark.common import UnexpectedToken
 from lark.lexer import Token
 from lark.tree import Tree
 
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 
 from storyscript.parser import Parser
 
@@ -135,13 +136,33 @@ def test_parser_service_output(parser):
     assert node.child(1) == Token('NAME', 'response')
 
 
-@mark.parametrize('comment', ['# one', '#one'])
+@mark.parametrize('comment', [
+    '# one', '#one', '### one', '### one ###', '###\none\n###',
+    '###\none\n  ### end'
+])
 def test_parser_comment(parser, comment):
     result = parser.parse('{}\n'.format(comment))
     node = result.node('start.block.line.comment')
     assert node.child(0) == Token('COMMENT', comment)
 
 
+def test_parser_comment_blocks(parser):
+    """
+    Ensures code between two block comments is not commented out
+    """
+    result = parser.parse('###\none\n###\na = 1\n###\ntwo\n###\n')
+    assignment = result.child(1).node('line.assignment')
+    assert assignment.node('path').child(0) == Token('NAME', 'a')
+    assert assignment.line() == '4'
+
+
+def test_parser_comment_unterminated(parser):
+    result = parser.parse('###\na = 1\n')
+    assert result.node('block.line.comment').child(0) == Token('COMMENT',
+                                                               '###')
+    assert result.child(1).node('line.assignment').line() == '2'
+
+
 def test_parser_if_block(parser, name_token):
     result = parser.parse('if expr\n\tvar=3\n')
     node = result.node('block.if_block')
@@ -197,3 +218,13 @@ def test_parser_function_output(parser):
     node = statement.node('function_output.typed_argument')
     assert node.child(0) == Token('NAME', 'name')
     assert node.node('types').child(0) == Token('INT_TYPE', 'int')
+
+
+def test_parser_cached_after_error(parser, int_token):
+    """
+    Ensures a cached parser can still be used after failing on a story
+    """
+    with raises(UnexpectedToken):
+        parser.parse('if x\n    a = \n')
+    result = parser.parse('3\n')
+    assert result.node('start.block.line.values.number').child(0) == int_token
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from lark.common import UnexpectedToken
+
+from pytest import fixture, raises
+
+from storyscript.app import App
+from storyscript.cli import Cli
+from storyscript.client import Client
+from storyscript.exceptions import ServerError, ServerMismatchError
+from storyscript.server import Server
+
+
+@fixture
+def client(request, tmpdir):
+    server = Server(str(tmpdir.join('test.sock')))
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.01})
+    thread.start()
+
+    def teardown():
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    request.addfinalizer(teardown)
+    return Client(server.path)
+
+
+def test_server_compile(client, tmpdir):
+    story = tmpdir.join('one.story')
+    story.write('alpine echo\n')
+    assert client.compile(str(story)) == App.compile(str(story))
+
+
+def test_server_compile_source(client):
+    result = client.request('compile', source='a = 1')
+    assert result == App.compile_source('a = 1')
+
+
+def test_server_lex(client):
+    result = client.request('lex', source='a = 1')
+    assert result['source'][0] == ['NAME', 'a']
+
+
+def test_server_socket_mode(client):
+    assert os.stat(client.path).st_mode & 0o077 == 0
+
+
+def test_server_mismatch(client):
+    """
+    Ensures a daemon using the default grammar refuses requests for another
+    """
+    client.ebnf_file = 'test.ebnf'
+    with raises(ServerMismatchError):
+        client.request('compile', source='a = 1')
+
+
+def test_server_error(client):
+    with raises(ServerError):
+        client.request('compile', source='a-b = 1')
+
+
+def test_server_stale_socket(tmpdir):
+    """
+    Ensures sockets left behind by a daemon are replaced
+    """
+    path = str(tmpdir.join('test.sock'))
+    Server(path).socket.close()
+    server = Server(path)
+    server.server_close()
+    assert not os.path.exists(path)
+
+
+def test_server_socket_file(tmpdir):
+    """
+    Ensures files that are not sockets are never removed
+    """
+    path = tmpdir.join('test.sock')
+    path.write('content')
+    with raises(ServerError):
+        Server(str(path))
+    assert path.read() == 'content'
+
+
+def test_server_socket_in_use(client):
+    """
+    Ensures a running daemon's socket is not taken over
+    """
+    with raises(ServerError):
+        Server(client.path)
+    assert client.request('compile', source='a = 1')
+
+
+def test_server_syntax_error(monkeypatch, client, tmpdir):
+    """
+    Ensures syntax errors are raised as when compiling locally
+    """
+    monkeypatch.setenv('STORYSCRIPT_SOCKET', client.path)
+    story = tmpdir.join('one.story')
+    story.write('foo = \n')
+    with raises(UnexpectedToken):
+        list(Cli.compile(str(story), None, 1))
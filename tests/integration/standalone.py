@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+
+from lark import Lark, __version__ as lark_version
+
+from pytest import fixture, mark
+
+from storyscript.parser import Grammar, Parser, Tables, parser
+
+
+@fixture(scope='module')
+def standalone(tmpdir_factory):
+    """
+    Generates the standalone module, as done at build time, and imports it
+    """
+    path = str(tmpdir_factory.mktemp('standalone').join('standalone.py'))
+    Parser().generate(path)
+    spec = importlib.util.spec_from_file_location('standalone', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@fixture(scope='module')
+def dynamic():
+    parser = Parser()
+    return Lark(parser.grammar(), parser='lalr', postlex=parser.indenter())
+
+
+def test_standalone_lark_version(standalone):
+    assert standalone.lark_version == lark_version
+
+
+def test_standalone_grammar_hash(standalone):
+    parser = Parser()
+    assert standalone.grammar_hash == parser.grammar_hash(parser.grammar())
+
+
+@mark.parametrize('source', [
+    'a = 1\n',
+    'a = [1, 2, "three"]\n',
+    'a = {"one":1}\n',
+    'a = alpine echo text:"hello"\n',
+    'alpine echo text:"hello" as output\n    message:"hi"\n',
+    'if a == 1\n    b = 2\nelse if a > 2\n    b = 3\nelse\n    b = 4\n',
+    'foreach items as item\n    alpine echo\n',
+    'function sum a:int b:int -> c:int\n    return c\n',
+    '# comment\na = `path`\n'
+])
+def test_standalone_parity(standalone, dynamic, source):
+    """
+    Ensures the standalone module and the dynamic grammar produce the same
+    trees
+    """
+    tables = Tables(standalone.tables, postlex=Parser().indenter())
+    assert tables.parse(source) == dynamic.parse(source)
+
+
+def test_standalone_without_grammar(mocker, standalone):
+    """
+    Ensures parsing with the standalone module never builds the grammar
+    """
+    mocker.patch.object(parser, 'standalone', standalone)
+    mocker.patch.object(Parser, 'cache', {})
+    mocker.spy(Grammar, 'build')
+    Parser().parse('a = 1')
+    assert Grammar.build.call_count == 0
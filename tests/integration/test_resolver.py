@@ -42,6 +42,35 @@ def test_resolve_path_undefined():
 ])
 def test_resolve_resolve(obj, data, result):
     assert Resolver.resolve(obj, data) == result
+    assert Resolver.compile(obj).resolve(data) == result
+
+
+@pytest.mark.parametrize('obj, data', [
+    ({'$OBJECT': 'string', 'string': '{} {}',
+      'values': [{'$OBJECT': 'path', 'paths': ['a']},
+                 {'$OBJECT': 'file', 'string': 'b'}]}, {'a': 1}),
+    ({'$OBJECT': 'method', 'method': 'like',
+      'left': {'$OBJECT': 'path', 'paths': ['a']},
+      'right': {'$OBJECT': 'regexp', 'regexp': '^a'}}, {'a': 'abc'}),
+    ({'$OBJECT': 'method', 'method': 'notlike',
+      'left': {'$OBJECT': 'path', 'paths': ['a']},
+      'right': {'$OBJECT': 'string', 'string': '^a'}}, {'a': 'abc'}),
+    ({'$OBJECT': 'dict',
+      'items': [[{'$OBJECT': 'string', 'string': 'k'},
+                 {'$OBJECT': 'list',
+                  'items': [{'$OBJECT': 'path', 'paths': ['a', '0']}, 2]}]]},
+     {'a': [1]}),
+    ({'$OBJECT': 'argument', 'argument': {'$OBJECT': 'path',
+                                          'paths': ['a', 'b']}}, {'a': 1}),
+    ({'k': [{'$OBJECT': 'expression', 'expression': '{} > 1',
+             'values': [{'$OBJECT': 'path', 'paths': ['a']}]}]}, {'a': 2}),
+    (['a', {'$OBJECT': 'path', 'paths': ['a']}], {'a': 'b'})
+])
+def test_resolve_compile(obj, data):
+    """
+    Ensures plans resolve objects as Resolver.resolve does
+    """
+    assert Resolver.compile(obj).resolve(data) == Resolver.resolve(obj, data)
 
 
 def test_resolve_obj_regexp():
@@ -51,6 +80,8 @@ def test_resolve_obj_regexp():
 
 @pytest.mark.parametrize('method, left, right, result', [
     ('like', 'abc', re.compile('^abc'), True),
+    ('like', 'abc', '^b', False),
+    ('notlike', 'abc', '^b', True),
     ('has', {'b': 1}, 'b', True),
     ('contains', {'b': 1}, 'b', True),
     ('contains', {}, 'c', False),
@@ -96,3 +127,19 @@ def test_resolve_dict(dictionary, data, result):
 ])
 def test_stringify(value, result):
     assert Resolver.stringify(value) == result
+
+
+@pytest.mark.parametrize('expression', ['==', '!=', '<', '<=', '>', '>='])
+def test_resolve_many(expression):
+    """
+    Ensures resolving many contexts at once gives the same results as
+    resolving them one by one
+    """
+    item = {'$OBJECT': 'expression', 'expression': '{} %s {}' % expression,
+            'values': [{'$OBJECT': 'path', 'paths': ['a']},
+                       {'$OBJECT': 'path', 'paths': ['b']}]}
+    contexts = [{'a': a, 'b': b} for a in (0, 1, 2.5) for b in (1, 2 ** 60)]
+    contexts += [{'a': 'x', 'b': 'y'}]
+    for batch in (contexts[:-1], contexts):
+        result = Resolver.resolve_many(item, batch)
+        assert result == [Resolver.resolve(item, data) for data in batch]
@@ -2,11 +2,15 @@
 import json
 import os
 
-from pytest import fixture
+from pytest import fixture, mark, raises
 
 from storyscript.app import App
+from storyscript.cache import Cache
 from storyscript.compiler import Compiler
+from storyscript.output import Output
 from storyscript.parser import Grammar, Parser
+from storyscript.version import version
+from storyscript.watcher import Watcher
 
 
 @fixture
@@ -66,25 +70,196 @@ def test_app_get_stories_directory(mocker):
     assert App.get_stories('stories') == ['root/one.story']
 
 
-def test_app_parse(patch, parser, read_story):
+@fixture
+def cache(patch):
+    patch.init(Cache)
+    patch.many(Cache, ['get', 'set'])
+    Cache.get.return_value = None
+
+
+def test_app_compile_source(patch, parser, cache):
     """
-    Ensures App.parse runs Parser.parse
+    Ensures App.compile_source runs Parser.parse and compiles the tree
     """
     patch.object(Compiler, 'compile')
-    result = App.parse(['test.story'])
-    App.read_story.assert_called_with('test.story')
+    patch.object(Parser, 'checksum', return_value='hash')
+    patch.object(App, 'compiler_fingerprint', return_value='fingerprint')
+    result = App.compile_source('source')
     Parser.__init__.assert_called_with(ebnf_file=None)
-    Parser().parse.assert_called_with(App.read_story())
+    Cache.__init__.assert_called_with('stories')
+    key = Cache.key('source', 'hash', version, 'fingerprint')
+    Cache.get.assert_called_with(key)
+    Parser().parse.assert_called_with('source')
     Compiler.compile.assert_called_with(Parser().parse())
-    assert result == {'test.story': Compiler.compile()}
+    Cache.set.assert_called_with(key, Compiler.compile())
+    assert result == Compiler.compile()
 
 
-def test_app_parse_ebnf_file(patch, parser, read_story):
+def test_app_compiler_fingerprint(patch):
+    patch.object(App, 'fingerprint', None)
+    result = App.compiler_fingerprint()
+    assert len(result) == 64
+    assert App.fingerprint == result
+    assert App.compiler_fingerprint() == result
+
+
+def test_app_compiler_fingerprint_sources(patch):
+    """
+    Ensures the fingerprint covers the compiler and parser sources, but not
+    the standalone module
+    """
+    patch.object(App, 'fingerprint', None)
+    patch.object(Cache, 'fingerprint', return_value='hash')
+    assert App.compiler_fingerprint() == 'hash'
+    package, resources = Cache.fingerprint.call_args[0]
+    assert package == 'storyscript'
+    assert 'compiler/__init__.py' in resources
+    assert 'compiler/compiler.py' in resources
+    assert 'parser/parser.py' in resources
+    assert 'parser/standalone.py' not in resources
+
+
+def test_app_compiler_fingerprint_unreadable(patch):
+    patch.object(App, 'fingerprint', None)
+    patch.object(Cache, 'fingerprint', return_value=None)
+    assert App.compiler_fingerprint() == ''
+    assert App.fingerprint == ''
+
+
+def test_app_compile_source_no_fingerprint(patch, parser, cache):
+    """
+    Ensures stories are compiled without the cache when the compiler can't
+    be fingerprinted
+    """
     patch.object(Compiler, 'compile')
-    App.parse(['test.story'], ebnf_file='test.ebnf')
+    patch.object(App, 'compiler_fingerprint', return_value='')
+    result = App.compile_source('source')
+    assert Cache.get.call_count == 0
+    assert Cache.set.call_count == 0
+    assert result == Compiler.compile()
+
+
+def test_app_compile_source_cached(patch, parser, cache):
+    patch.object(Parser, 'checksum')
+    Cache.get.return_value = {'tree': {}}
+    result = App.compile_source('source')
+    assert Parser.parse.call_count == 0
+    assert Cache.set.call_count == 0
+    assert result == {'tree': {}}
+
+
+def test_app_compile_source_ebnf_file(patch, parser, cache):
+    patch.object(Compiler, 'compile')
+    patch.object(Parser, 'checksum')
+    App.compile_source('source', ebnf_file='test.ebnf')
     Parser.__init__.assert_called_with(ebnf_file='test.ebnf')
 
 
+def test_app_parse_story(patch, read_story):
+    patch.object(App, 'compile_source')
+    result = App.parse_story('test.story', ebnf_file='test.ebnf')
+    App.read_story.assert_called_with('test.story')
+    App.compile_source.assert_called_with(App.read_story(),
+                                          ebnf_file='test.ebnf')
+    assert result == App.compile_source()
+
+
+def test_app_parse_job(patch):
+    patch.object(App, 'parse_story')
+    result = App.parse_job('test.story', ebnf_file='test.ebnf')
+    App.parse_story.assert_called_with('test.story', ebnf_file='test.ebnf')
+    assert result == App.parse_story()
+
+
+def test_app_parse_job_error(patch):
+    patch.object(App, 'parse_story', side_effect=ValueError)
+    assert App.parse_job('test.story') is None
+
+
+def test_app_preload(patch):
+    patch.init(Parser)
+    patch.object(Parser, 'lark')
+    App.preload(ebnf_file='test.ebnf')
+    Parser.__init__.assert_called_with(ebnf_file='test.ebnf')
+    assert Parser.lark.call_count == 1
+
+
+def test_app_parse(patch):
+    """
+    Ensures App.parse compiles each story
+    """
+    patch.object(App, 'parse_story')
+    result = App.parse(['one.story', 'two.story'])
+    App.parse_story.assert_called_with('two.story', ebnf_file=None)
+    assert result == {'one.story': App.parse_story(),
+                      'two.story': App.parse_story()}
+
+
+def test_app_parse_ebnf_file(patch):
+    patch.object(App, 'parse_story')
+    App.parse(['test.story'], ebnf_file='test.ebnf')
+    App.parse_story.assert_called_with('test.story', ebnf_file='test.ebnf')
+
+
+def test_app_parse_jobs(patch):
+    patch.object(App, 'compiled_stories', return_value=[('one', 'tree')])
+    result = App.parse(['one'], ebnf_file='test.ebnf', jobs=2)
+    App.compiled_stories.assert_called_with(['one'], ebnf_file='test.ebnf',
+                                            jobs=2)
+    assert result == {'one': 'tree'}
+
+
+def test_app_compiled_stories(patch):
+    """
+    Ensures stories are compiled only as they are consumed
+    """
+    patch.object(App, 'parse_story')
+    result = App.compiled_stories(['one.story', 'two.story'])
+    assert App.parse_story.call_count == 0
+    assert next(result) == ('one.story', App.parse_story.return_value)
+    App.parse_story.assert_called_with('one.story', ebnf_file=None)
+    assert App.parse_story.call_count == 1
+
+
+def test_app_compiled_stories_jobs(patch):
+    patch.object(App, 'parse_parallel')
+    stories = ['one.story', 'two.story']
+    result = App.compiled_stories(stories, ebnf_file='test.ebnf', jobs=2)
+    App.parse_parallel.assert_called_with(stories, 2, ebnf_file='test.ebnf')
+    assert result == App.parse_parallel()
+
+
+def test_app_compiled_stories_all_cores(patch):
+    patch.object(App, 'parse_parallel')
+    patch.object(os, 'cpu_count', return_value=8)
+    stories = ['one.story', 'two.story']
+    App.compiled_stories(stories, jobs=0)
+    App.parse_parallel.assert_called_with(stories, 8, ebnf_file=None)
+
+
+def test_app_compiled_stories_single_story(patch):
+    """
+    Ensures no pool is started for a single story
+    """
+    patch.many(App, ['parse_parallel', 'parse_story'])
+    list(App.compiled_stories(['test.story'], jobs=4))
+    assert App.parse_parallel.call_count == 0
+
+
+def test_app_parse_parallel(patch):
+    """
+    Ensures App.parse_parallel compiles stories in a pool, compiling again
+    the stories that failed
+    """
+    pool = patch('storyscript.app.Pool')
+    patch.object(App, 'parse_story')
+    pool().__enter__().imap.return_value = ['one', None]
+    result = list(App.parse_parallel(['one.story', 'two.story'], 2))
+    pool.assert_called_with(2, initializer=App.preload, initargs=(None, ))
+    App.parse_story.assert_called_with('two.story', ebnf_file=None)
+    assert result == [('one.story', 'one'), ('two.story', App.parse_story())]
+
+
 def test_app_services():
     compiled_stories = {'a': {'services': ['one']}, 'b': {'services': ['two']}}
     result = App.services(compiled_stories)
@@ -97,23 +272,156 @@ def test_app_services_no_duplicates():
     assert result == ['one']
 
 
-def test_app_compile(patch):
+def test_app_dumps(patch):
     patch.object(json, 'dumps')
-    patch.many(App, ['get_stories', 'parse', 'services'])
-    result = App.compile('path')
-    App.get_stories.assert_called_with('path')
-    App.parse.assert_called_with(App.get_stories(), ebnf_file=None)
-    App.services.assert_called_with(App.parse())
-    dictionary = {'stories': App.parse(), 'services': App.services()}
+    patch.object(App, 'services')
+    result = App.dumps('stories')
+    App.services.assert_called_with('stories')
+    dictionary = {'stories': 'stories', 'services': App.services()}
     json.dumps.assert_called_with(dictionary, indent=2)
     assert result == json.dumps()
 
 
-def test_app_compile_ebnf_file(patch):
+@fixture
+def compiled():
+    return [('one.story', {'tree': {'1': {'ln': '1'}}, 'services': ['b']}),
+            ('two.story', {'tree': {}, 'services': ['b', 'a']})]
+
+
+def test_app_json_options():
+    assert App.json_options() == {'indent': 2}
+    assert App.json_options(compact=True) == {'separators': (',', ':')}
+
+
+def test_app_dumps_compact(patch):
     patch.object(json, 'dumps')
-    patch.many(App, ['get_stories', 'parse', 'services'])
-    App.compile('path', ebnf_file='test.ebnf')
-    App.parse.assert_called_with(App.get_stories(), ebnf_file='test.ebnf')
+    patch.object(App, 'services')
+    App.dumps('stories', compact=True)
+    dictionary = {'stories': 'stories', 'services': App.services()}
+    json.dumps.assert_called_with(dictionary, separators=(',', ':'))
+
+
+@mark.parametrize('compact', [False, True])
+@mark.parametrize('size', [0, 1, 2])
+def test_app_dumps_stream(compiled, compact, size):
+    """
+    Ensures the streamed output is the same as dumps
+    """
+    result = ''.join(App.dumps_stream(iter(compiled[:size]), compact))
+    assert result == App.dumps(dict(compiled[:size]), compact)
+
+
+def test_app_dumps_lines(compiled):
+    result = ''.join(App.dumps_lines(compiled)).splitlines()
+    assert json.loads(result[0]) == {'story': 'one.story',
+                                     'compiled': compiled[0][1]}
+    assert json.loads(result[1])['story'] == 'two.story'
+    assert json.loads(result[2]) == {'services': ['a', 'b']}
+    assert len(result) == 3
+
+
+def test_app_stream(patch):
+    patch.many(App, ['get_stories', 'compiled_stories', 'dumps_stream'])
+    result = App.stream('path', ebnf_file='test.ebnf', jobs=2, compact=True)
+    App.get_stories.assert_called_with('path')
+    App.compiled_stories.assert_called_with(App.get_stories(),
+                                            ebnf_file='test.ebnf', jobs=2)
+    App.dumps_stream.assert_called_with(App.compiled_stories(),
+                                        compact=True)
+    assert result == App.dumps_stream()
+
+
+def test_app_stream_jsonl(patch):
+    patch.many(App, ['get_stories', 'compiled_stories', 'dumps_lines'])
+    result = App.stream('path', jsonl=True)
+    App.dumps_lines.assert_called_with(App.compiled_stories())
+    assert result == App.dumps_lines()
+
+
+def test_app_compile(patch):
+    patch.object(App, 'stream', return_value=['a', 'b'])
+    result = App.compile('path', ebnf_file='test.ebnf', jobs=4, jsonl=True)
+    App.stream.assert_called_with('path', ebnf_file='test.ebnf', jobs=4,
+                                  compact=False, jsonl=True)
+    assert result == 'ab'
+
+
+def test_app_bundle(patch):
+    patch.object(App, 'services')
+    result = App.bundle('stories')
+    App.services.assert_called_with('stories')
+    assert result == {'stories': 'stories', 'services': App.services()}
+
+
+def test_app_compile_dict(patch):
+    patch.many(App, ['get_stories', 'parse', 'bundle'])
+    result = App.compile_dict('path', ebnf_file='test.ebnf', jobs=2)
+    App.get_stories.assert_called_with('path')
+    App.parse.assert_called_with(App.get_stories(), ebnf_file='test.ebnf',
+                                 jobs=2)
+    App.bundle.assert_called_with(App.parse())
+    assert result == App.bundle()
+
+
+def test_app_compile_sources(patch, parser):
+    patch.object(Compiler, 'compile')
+    patch.many(App, ['read_story', 'bundle'])
+    result = App.compile_sources({'one': 'a = 1'}, ebnf_file='test.ebnf')
+    Parser.__init__.assert_called_with(ebnf_file='test.ebnf')
+    Parser.parse.assert_called_with('a = 1')
+    Compiler.compile.assert_called_with(Parser.parse())
+    App.bundle.assert_called_with({'one': Compiler.compile()})
+    assert App.read_story.call_count == 0
+    assert result == App.bundle()
+
+
+def test_app_write(patch):
+    patch.object(Output, 'write')
+    App.write('output.json', ['content'])
+    Output.write.assert_called_with('output.json', ['content'])
+
+
+@fixture
+def watcher(patch):
+    patch.init(Watcher)
+    patch.object(Watcher, 'watch')
+    patch.many(App, ['preload', 'parse_story', 'get_stories', 'dumps',
+                     'write'])
+    App.parse_story.side_effect = lambda story, ebnf_file: story
+    App.get_stories.return_value = ['one', 'two']
+
+
+def test_app_watch(watcher):
+    Watcher.watch.return_value = [(['one', 'two'], [])]
+    result = list(App.watch('path', 'output.json', ebnf_file='test.ebnf'))
+    App.preload.assert_called_with(ebnf_file='test.ebnf')
+    Watcher.__init__.assert_called_with('path', App.get_stories)
+    App.parse_story.assert_called_with('two', ebnf_file='test.ebnf')
+    App.dumps.assert_called_with({'one': 'one', 'two': 'two'})
+    App.write.assert_called_with('output.json', [App.dumps()])
+    assert result == [(['one', 'two'], {})]
+
+
+def test_app_watch_removed(watcher):
+    Watcher.watch.return_value = [(['one', 'two'], []), ([], ['two'])]
+    App.get_stories.side_effect = [['one', 'two'], ['one']]
+    list(App.watch('path', 'output.json'))
+    App.dumps.assert_called_with({'one': 'one'})
+
+
+def test_app_watch_errors(watcher):
+    """
+    Ensures the output is not written while a story has errors
+    """
+    error = ValueError()
+    Watcher.watch.return_value = [(['one', 'two'], []), (['one'], []),
+                                  (['two'], [])]
+    App.parse_story.side_effect = ['one', error, 'one', 'two']
+    result = list(App.watch('path', 'output.json'))
+    assert result[0] == (['one', 'two'], {'two': error})
+    assert result[1] == (['one'], {'two': error})
+    assert result[2] == (['two'], {})
+    assert App.write.call_count == 1
 
 
 def test_app_lexer(patch, read_story):
@@ -121,12 +429,32 @@ def test_app_lexer(patch, read_story):
     patch.object(Parser, 'lex')
     patch.object(App, 'get_stories', return_value=['one.story'])
     result = App.lex('/path')
+    assert App.read_story.call_count == 0
+    assert list(result) == [('one.story', Parser.lex.return_value)]
     App.read_story.assert_called_with('one.story')
     Parser.lex.assert_called_with(App.read_story())
-    assert result == {'one.story': Parser.lex()}
 
 
 def test_app_grammar(patch):
     patch.init(Grammar)
     patch.object(Grammar, 'build')
     assert App.grammar() == Grammar().build()
+
+
+def test_app_cache_stats(patch):
+    patch.init(Cache)
+    patch.object(Cache, 'sections', return_value=['tables'])
+    patch.object(Cache, 'stats')
+    assert App.cache_stats() == {'tables': Cache.stats()}
+    Cache.__init__.assert_called_with('tables')
+
+
+def test_app_clear_cache(patch):
+    patch.init(Cache)
+    patch.object(Cache, 'sections', return_value=['tables'])
+    patch.object(Cache, 'clear')
+    patch.object(Parser, 'clear_cache')
+    App.clear_cache()
+    Cache.__init__.assert_called_with('tables')
+    assert Cache.clear.call_count == 1
+    assert Parser.clear_cache.call_count == 1
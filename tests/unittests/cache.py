@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import pickle
+import pkgutil
+
+from pytest import fixture, mark
+
+from storyscript.cache import Cache
+
+
+@fixture
+def root(tmpdir):
+    return str(tmpdir.join('storyscript'))
+
+
+@fixture
+def cache(root):
+    return Cache('section', root=root)
+
+
+def test_cache_init(cache, root):
+    assert cache.section == 'section'
+    assert cache.root == root
+
+
+def test_cache_init_default_root(patch):
+    patch.object(Cache, 'default_root')
+    assert Cache('section').root == Cache.default_root()
+
+
+def test_cache_default_root(monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', '/cache')
+    assert Cache.default_root() == '/cache/storyscript'
+
+
+def test_cache_default_root_home(monkeypatch):
+    monkeypatch.delenv('XDG_CACHE_HOME', raising=False)
+    monkeypatch.setenv('HOME', '/home')
+    assert Cache.default_root() == '/home/.cache/storyscript'
+
+
+def test_cache_key():
+    expected = hashlib.sha256('one\0two\x001'.encode()).hexdigest()
+    assert Cache.key('one', 'two', 1) == expected
+
+
+def test_cache_fingerprint(patch):
+    patch.object(pkgutil, 'get_data', side_effect=[b'one', b'two'])
+    result = Cache.fingerprint('package', ['one.py', 'two.py'])
+    pkgutil.get_data.assert_called_with('package', 'two.py')
+    assert result == hashlib.sha256(b'onetwo').hexdigest()
+
+
+@mark.parametrize('effect', [OSError, [None]])
+def test_cache_fingerprint_unreadable(patch, effect):
+    """
+    Ensures there's no fingerprint when a resource can't be read, for
+    example because only bytecode was installed
+    """
+    patch.object(pkgutil, 'get_data', side_effect=effect)
+    assert Cache.fingerprint('package', ['one.py']) is None
+
+
+@mark.parametrize('value, expected', [('1', True), ('', False)])
+def test_cache_disabled(monkeypatch, value, expected):
+    monkeypatch.setenv('STORYSCRIPT_NO_CACHE', value)
+    assert Cache.disabled() is expected
+
+
+def test_cache_disabled_unset(monkeypatch):
+    monkeypatch.delenv('STORYSCRIPT_NO_CACHE', raising=False)
+    assert Cache.disabled() is False
+
+
+def test_cache_directory(cache, root):
+    assert cache.directory() == os.path.join(root, 'section')
+
+
+def test_cache_path(cache, root):
+    assert cache.path('key') == os.path.join(root, 'section', 'key')
+
+
+def test_cache_get_missing(cache):
+    assert cache.get('key') is None
+
+
+def test_cache_get_corrupted(cache):
+    os.makedirs(cache.directory())
+    with open(cache.path('key'), 'wb') as file:
+        file.write(b'corrupted')
+    assert cache.get('key') is None
+
+
+def test_cache_set(cache):
+    cache.set('key', {'value': 1})
+    assert cache.get('key') == {'value': 1}
+    assert os.listdir(cache.directory()) == ['key']
+
+
+def test_cache_set_unwritable(patch, cache):
+    patch.object(os, 'makedirs', side_effect=OSError)
+    cache.set('key', 'value')
+    assert cache.get('key') is None
+
+
+def test_cache_set_unpicklable(patch, cache):
+    """
+    Ensures entries that can't be pickled are skipped without leaving the
+    temporary file behind
+    """
+    patch.object(pickle, 'dump', side_effect=RecursionError)
+    cache.set('key', 'value')
+    assert os.listdir(cache.directory()) == []
+
+
+def test_cache_stats(cache):
+    cache.set('one', 'value')
+    cache.set('two', 'value')
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['size'] == os.path.getsize(cache.path('one')) * 2
+
+
+def test_cache_stats_empty(cache):
+    assert cache.stats() == {'entries': 0, 'size': 0}
+
+
+def test_cache_clear(cache):
+    cache.set('key', 'value')
+    cache.clear()
+    assert os.path.isdir(cache.directory()) is False
+
+
+def test_cache_sections(root):
+    Cache('two', root=root).set('key', 'value')
+    Cache('one', root=root).set('key', 'value')
+    assert Cache.sections(root=root) == ['one', 'two']
+
+
+def test_cache_sections_empty(root):
+    assert Cache.sections(root=root) == []
+
+
+def test_cache_disabled_get_set(monkeypatch, cache):
+    cache.set('key', 'value')
+    monkeypatch.setenv('STORYSCRIPT_NO_CACHE', '1')
+    assert cache.get('key') is None
+    cache.set('other', 'value')
+    monkeypatch.delenv('STORYSCRIPT_NO_CACHE')
+    assert cache.get('key') == 'value'
+    assert cache.get('other') is None
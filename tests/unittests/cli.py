@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+
 import click
 from click.testing import CliRunner
 
 from pytest import fixture, mark
 
 from storyscript.app import App
+from storyscript.cache import Cache
 from storyscript.cli import Cli
+from storyscript.client import Client
+from storyscript.exceptions import ServerError, ServerMismatchError
+from storyscript.parser import Grammar
+from storyscript.server import Server
 from storyscript.version import version
 
 
@@ -21,10 +29,18 @@ def echo(patch):
 
 @fixture
 def app(patch):
-    patch.object(App, 'compile')
+    patch.object(App, 'stream', return_value=['{"a": ', '1}'])
+    patch.object(Client, 'available', return_value=False)
     return App
 
 
+@fixture
+def client(patch):
+    patch.init(Client)
+    patch.many(Client, ['available', 'compile', 'lex'])
+    patch.many(App, ['stream', 'lex'])
+
+
 def test_cli(mocker, runner, echo):
     runner.invoke(Cli.main, [])
     # NOTE(vesuvium): I didn't find how to get the context in testing
@@ -46,7 +62,8 @@ def test_cli_parse(patch, runner, echo, app):
     """
     patch.object(click, 'style')
     runner.invoke(Cli.parse, ['/path'])
-    App.compile.assert_called_with('/path', ebnf_file=None)
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=False, jsonl=False)
     click.style.assert_called_with('Script syntax passed!', fg='green')
     click.echo.assert_called_with(click.style())
 
@@ -59,7 +76,7 @@ def test_cli_parse_output_file(runner, app, tmpdir):
     """
     tmp_file = tmpdir.join('output_file')
     runner.invoke(Cli.parse, ['/path', str(tmp_file)])
-    tmp_file.read()  # would expect exception if no file written
+    assert tmp_file.read() == '{"a": 1}'
 
 
 @mark.parametrize('option', ['--silent', '-s'])
@@ -67,41 +84,274 @@ def test_cli_parse_silent(runner, echo, app, option):
     """
     Ensures --silent makes everything quiet
     """
-    result = runner.invoke(Cli.parse, ['/path', option])
-    App.compile.assert_called_with('/path', ebnf_file=None)
+    result = runner.invoke(Cli.parse, ['/path', option, '--json'])
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=False, jsonl=False)
     assert result.output == ''
     assert click.echo.call_count == 0
 
 
 @mark.parametrize('option', ['--json', '-j'])
-def test_cli_parse_json(runner, echo, app, option):
+def test_cli_parse_json(runner, app, option):
     """
     Ensures --json outputs json
     """
-    runner.invoke(Cli.parse, ['/path', option])
-    App.compile.assert_called_with('/path', ebnf_file=None)
-    click.echo.assert_called_with(App.compile())
+    result = runner.invoke(Cli.parse, ['/path', option])
+    assert result.output == '{"a": 1}\n'
+
+
+def test_cli_parse_json_output_file(runner, app, tmpdir):
+    tmp_file = tmpdir.join('output_file')
+    result = runner.invoke(Cli.parse, ['/path', str(tmp_file), '--json'])
+    assert result.output == '{"a": 1}\n'
+    assert tmp_file.read() == '{"a": 1}'
+
+
+def test_cli_parse_compact(runner, echo, app):
+    runner.invoke(Cli.parse, ['/path', '--compact'])
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=True, jsonl=False)
+
+
+def test_cli_parse_jsonl(runner, app):
+    App.stream.return_value = ['{"story": "a"}\n', '{"services": []}\n']
+    result = runner.invoke(Cli.parse, ['/path', '--json', '--jsonl'])
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=False, jsonl=True)
+    assert result.output == '{"story": "a"}\n{"services": []}\n'
 
 
 def test_clis_parse_ebnf_file(runner, echo, app):
     runner.invoke(Cli.parse, ['/path', '--ebnf-file', 'test.grammar'])
-    App.compile.assert_called_with('/path', ebnf_file='test.grammar')
+    App.stream.assert_called_with('/path', ebnf_file='test.grammar',
+                                  jobs=1, compact=False, jsonl=False)
+
+
+def test_cli_parse_no_cache(monkeypatch, runner, echo, app):
+    monkeypatch.setenv('STORYSCRIPT_NO_CACHE', '')
+    runner.invoke(Cli.parse, ['/path', '--no-cache'])
+    assert os.environ['STORYSCRIPT_NO_CACHE'] == '1'
+    assert App.stream.call_count == 1
+
+
+def test_cli_parse_jobs(runner, echo, app):
+    runner.invoke(Cli.parse, ['/path', '--jobs', '4'])
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=4,
+                                  compact=False, jsonl=False)
+
+
+def test_cli_tee(magic):
+    stream = magic()
+    assert list(Cli.tee(['a', 'b'], stream)) == ['a', 'b']
+    stream.write.assert_called_with('b')
+
+
+def test_cli_compile(client):
+    Client.available.return_value = False
+    result = Cli.compile('/path', None, 1)
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=False, jsonl=False)
+    assert result == App.stream()
 
 
-def test_cli_lexer(patch, magic, runner, app, echo):
+def test_cli_compile_daemon(client):
+    result = Cli.compile('/path', None, 2, compact=True)
+    Client.compile.assert_called_with('/path', jobs=2, compact=True,
+                                      jsonl=False)
+    assert result == [Client.compile()]
+    assert App.stream.call_count == 0
+
+
+def test_cli_compile_daemon_ebnf_file(client):
+    Cli.compile('/path', 'test.ebnf', 1)
+    Client.__init__.assert_called_with(ebnf_file='test.ebnf')
+
+
+def test_cli_compile_daemon_mismatch(client):
+    """
+    Ensures stories are compiled locally when the daemon runs another
+    version or grammar
+    """
+    Client.compile.side_effect = ServerMismatchError('mismatch')
+    result = Cli.compile('/path', 'test.ebnf', 1)
+    App.stream.assert_called_with('/path', ebnf_file='test.ebnf', jobs=1,
+                                  compact=False, jsonl=False)
+    assert result == App.stream()
+
+
+def test_cli_compile_daemon_error(client):
+    """
+    Ensures stories are compiled locally when the daemon fails, so that
+    syntax errors are raised as usual
+    """
+    Client.compile.side_effect = ServerError('StoryscriptSyntaxError: a')
+    result = Cli.compile('/path', None, 1)
+    App.stream.assert_called_with('/path', ebnf_file=None, jobs=1,
+                                  compact=False, jsonl=False)
+    assert result == App.stream()
+
+
+def test_cli_compile_daemon_no_cache(patch, client):
+    patch.object(Cache, 'disabled', return_value=True)
+    result = Cli.compile('/path', None, 1)
+    assert Client.compile.call_count == 0
+    assert result == App.stream()
+
+
+def test_cli_compile_daemon_down(client):
+    Client.compile.side_effect = ConnectionRefusedError
+    result = Cli.compile('/path', None, 1)
+    assert result == App.stream()
+
+
+def test_cli_tokens(client):
+    Client.available.return_value = False
+    result = Cli.tokens('/path')
+    App.lex.assert_called_with('/path')
+    assert result == App.lex()
+
+
+def test_cli_tokens_daemon(client):
+    result = Cli.tokens('/path')
+    Client.lex.assert_called_with('/path')
+    assert result == Client.lex().items()
+    assert App.lex.call_count == 0
+
+
+def test_cli_tokens_daemon_down(client):
+    Client.lex.side_effect = FileNotFoundError
+    assert Cli.tokens('/path') == App.lex()
+
+
+def test_cli_tokens_daemon_error(client):
+    Client.lex.side_effect = ServerError('error')
+    assert Cli.tokens('/path') == App.lex()
+
+
+def test_cli_parse_watch(patch, runner, app):
+    patch.object(Cli, 'watch')
+    runner.invoke(Cli.parse, ['/path', 'output.json', '--watch'])
+    Cli.watch.assert_called_with('/path', 'output.json', False, None)
+    assert App.stream.call_count == 0
+
+
+def test_cli_parse_watch_output(patch, runner, app):
+    patch.object(Cli, 'watch')
+    result = runner.invoke(Cli.parse, ['/path', '--watch'])
+    assert result.exit_code == 2
+    assert Cli.watch.call_count == 0
+
+
+def test_cli_watch(patch, runner, echo):
+    patch.object(App, 'watch', return_value=[(['one'], {})])
+    patch.object(click, 'style')
+    Cli.watch('/path', 'output.json', False, 'test.ebnf')
+    App.watch.assert_called_with('/path', 'output.json',
+                                 ebnf_file='test.ebnf')
+    click.style.assert_called_with('Compiled 1 stories', fg='green')
+    click.echo.assert_called_with(click.style())
+
+
+def test_cli_watch_errors(patch, runner, echo):
+    patch.object(App, 'watch', return_value=[(['one'], {'one': 'error'})])
+    patch.object(click, 'style')
+    Cli.watch('/path', 'output.json', False, None)
+    click.style.assert_called_with('one: error', fg='red')
+    assert click.echo.call_count == 1
+
+
+def test_cli_watch_silent(patch, runner, echo):
+    patch.object(App, 'watch', return_value=[(['one'], {})])
+    Cli.watch('/path', 'output.json', True, None)
+    assert click.echo.call_count == 0
+
+
+@fixture
+def tokens(magic):
+    return [('one.story', [magic(type='NAME', value='a'),
+                           magic(type='_NL', value='\n\t')])]
+
+
+def test_cli_lexer(patch, runner, app, tokens):
     """
     Ensures the lex command outputs lexer tokens
     """
-    token = magic(type='token', value='value')
-    patch.object(App, 'lex', return_value={'one.story': [token]})
-    runner.invoke(Cli.lex, ['/path'])
+    patch.object(App, 'lex', return_value=tokens)
+    result = runner.invoke(Cli.lex, ['/path'])
     app.lex.assert_called_with('/path')
-    click.echo.assert_called_with('0 token value')
-    assert click.echo.call_count == 2
+    assert result.output == 'File: one.story\n0 NAME a\n1 _NL \n\t\n'
+
+
+def test_cli_lexer_json(patch, runner, app, tokens):
+    patch.object(App, 'lex', return_value=tokens)
+    result = runner.invoke(Cli.lex, ['/path', '--format', 'json'])
+    assert json.loads(result.output) == {'one.story': [['NAME', 'a'],
+                                                       ['_NL', '\n\t']]}
+
+
+def test_cli_lexer_json_empty():
+    assert ''.join(Cli.lex_json([])) == '{}\n'
+
+
+def test_cli_lexer_tsv(patch, runner, app, tokens):
+    patch.object(App, 'lex', return_value=tokens)
+    result = runner.invoke(Cli.lex, ['/path', '--format', 'tsv'])
+    assert result.output == ('file\tindex\ttype\tvalue\n'
+                             'one.story\t0\tNAME\ta\n'
+                             'one.story\t1\t_NL\t\\n\\t\n')
+
+
+def test_cli_lexer_format(runner, app):
+    result = runner.invoke(Cli.lex, ['/path', '--format', 'xml'])
+    assert result.exit_code == 2
+
 
+@mark.parametrize('value, expected', [('a', 'a'), ('\t', '\\t'),
+                                      ('a\r\n', 'a\\r\\n'),
+                                      ('\\n', '\\\\n')])
+def test_cli_escape(value, expected):
+    assert Cli.escape(value) == expected
 
-def test_cli_grammar(patch, runner, app, echo):
-    patch.object(App, 'grammar')
+
+def test_cli_serve(patch, monkeypatch, runner, echo):
+    monkeypatch.setenv('STORYSCRIPT_SOCKET', 'test.sock')
+    patch.init(Server)
+    patch.many(Server, ['serve_forever', 'server_close'])
+    Server.path = 'test.sock'
+    runner.invoke(Cli.serve, ['--socket', 'test.sock'])
+    Server.__init__.assert_called_with('test.sock', ebnf_file=None)
+    click.echo.assert_called_with('Listening on test.sock')
+    assert Server.serve_forever.call_count == 1
+    assert Server.server_close.call_count == 1
+
+
+def test_cli_serve_socket_hint(patch, monkeypatch, runner, echo):
+    monkeypatch.delenv('STORYSCRIPT_SOCKET', raising=False)
+    patch.init(Server)
+    patch.many(Server, ['serve_forever', 'server_close'])
+    Server.path = 'test.sock'
+    runner.invoke(Cli.serve, [])
+    message = 'Set STORYSCRIPT_SOCKET=test.sock to forward commands to it'
+    click.echo.assert_called_with(message)
+
+
+def test_cli_grammar(patch, runner, echo):
+    patch.init(Grammar)
+    patch.object(Grammar, 'build')
     runner.invoke(Cli.grammar, [])
-    assert app.grammar.call_count == 1
-    click.echo.assert_called_with(app.grammar())
+    assert Grammar.build.call_count == 1
+    click.echo.assert_called_with(Grammar().build())
+
+
+def test_cli_cache_stats(patch, runner, echo):
+    stats = {'tables': {'entries': 1, 'size': 10}}
+    patch.object(App, 'cache_stats', return_value=stats)
+    runner.invoke(Cli.main, ['cache', 'stats'])
+    click.echo.assert_called_with('tables: 1 entries, 10 bytes')
+
+
+def test_cli_cache_clear(patch, runner, echo):
+    patch.object(App, 'clear_cache')
+    runner.invoke(Cli.main, ['cache', 'clear'])
+    assert App.clear_cache.call_count == 1
+    click.echo.assert_called_with('Cache cleared')
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import socket
+
+from pytest import raises
+
+from storyscript.client import Client, LexToken
+
+
+def test_client_init(monkeypatch):
+    monkeypatch.setenv('STORYSCRIPT_SOCKET', 'env.sock')
+    assert Client().path == 'env.sock'
+    assert Client().ebnf_file is None
+    assert Client('test.sock', ebnf_file='test.ebnf').path == 'test.sock'
+
+
+def test_client_init_opt_in(monkeypatch):
+    """
+    Ensures the daemon is not used unless $STORYSCRIPT_SOCKET is set
+    """
+    monkeypatch.delenv('STORYSCRIPT_SOCKET', raising=False)
+    assert Client().path is None
+    assert Client().available() is False
+
+
+def test_client_available(tmpdir):
+    path = str(tmpdir.join('test.sock'))
+    assert Client(path).available() is False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        assert Client(path).available() is True
+
+
+def test_client_available_file(tmpdir):
+    path = tmpdir.join('test.sock')
+    path.write('')
+    assert Client(str(path)).available() is False
+
+
+def test_client_available_owner(patch, tmpdir):
+    """
+    Ensures sockets of other users are not used
+    """
+    path = str(tmpdir.join('test.sock'))
+    patch.object(os, 'getuid', return_value=os.getuid() + 1)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        assert Client(path).available() is False
+
+
+def test_client_request_down(tmpdir):
+    with raises(OSError):
+        Client(str(tmpdir.join('test.sock'))).request('compile')
+
+
+def test_client_compile(patch):
+    patch.object(Client, 'request')
+    result = Client('test.sock').compile('stories', jobs=2)
+    Client.request.assert_called_with('compile', path='stories', jobs=2,
+                                      compact=False, jsonl=False)
+    assert result == Client.request()
+
+
+def test_client_lex(patch):
+    patch.object(Client, 'request', return_value={'one': [['NAME', 'a']]})
+    result = Client('test.sock').lex('stories')
+    Client.request.assert_called_with('lex', path='stories')
+    assert result == {'one': [LexToken('NAME', 'a')]}
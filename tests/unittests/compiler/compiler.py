@@ -16,39 +16,47 @@ def compiler():
 
 def test_compiler_init(compiler):
     assert compiler.lines == {}
+    assert compiler.previous_line is None
+    assert compiler.conditionals == []
+    assert compiler.deferred == []
     assert compiler.services == []
     assert compiler.functions == {}
     assert compiler.outputs == {}
 
 
-def test_compiler_sorted_lines(compiler):
-    compiler.lines = {'1': '1', '2': '2'}
-    assert compiler.sorted_lines() == ['1', '2']
-
-
-def test_compiler_last_line(patch, compiler):
-    patch.object(Compiler, 'sorted_lines')
-    compiler.lines = {'1': '1'}
-    assert compiler.last_line() == compiler.sorted_lines()[-1]
+def test_compiler_last_line(compiler):
+    compiler.previous_line = '1'
+    assert compiler.last_line() == '1'
 
 
 def test_compiler_last_line_no_lines(compiler):
     assert compiler.last_line() is None
 
 
-def test_compiler_set_next_line(patch, compiler):
-    patch.object(Compiler, 'last_line', return_value='1')
+def test_compiler_set_next_line(compiler):
+    compiler.previous_line = '1'
     compiler.lines['1'] = {}
     compiler.set_next_line('2')
     assert compiler.lines['1']['next'] == '2'
 
 
-def test_compiler_set_exit_line(patch, compiler):
-    patch.object(Compiler, 'sorted_lines', return_value=['1', '2'])
+def test_compiler_set_next_line_first(compiler):
+    compiler.set_next_line('1')
+    assert compiler.lines == {}
+
+
+def test_compiler_set_exit_line(compiler):
     compiler.lines = {'1': {}, '2': {'method': 'if'}}
+    compiler.conditionals = ['1']
     compiler.set_exit_line('3')
-    assert compiler.sorted_lines.call_count == 1
-    assert compiler.lines['2']['exit'] == '3'
+    assert compiler.lines['1']['exit'] == '3'
+    assert compiler.conditionals == ['3']
+
+
+def test_compiler_set_exit_line_no_conditionals(compiler):
+    compiler.lines = {'1': {'method': 'if'}}
+    compiler.set_exit_line('2')
+    assert 'exit' not in compiler.lines['1']
 
 
 def test_compiler_output(tree):
@@ -84,6 +92,17 @@ def test_compiler_make_line(compiler):
                       'parent': None}}
     compiler.make_line('method', '1')
     assert compiler.lines == expected
+    assert compiler.previous_line == '1'
+
+
+def test_compiler_make_line_order(compiler):
+    """
+    Ensures lines are kept in the order they were made
+    """
+    for line in ['9', '10', '11']:
+        compiler.make_line('method', line)
+    assert list(compiler.lines) == ['9', '10', '11']
+    assert compiler.previous_line == '11'
 
 
 @mark.parametrize('keywords', ['service', 'command', 'function', 'output',
@@ -208,7 +227,7 @@ def test_compiler_service_command(patch, compiler, tree):
     service = tree.child().child().value
     assert compiler.outputs[tree.line()] == Compiler.output()
     compiler.add_line.assert_called_with('execute', line, service=service,
-                                         command=tree.node().child(),
+                                         command=tree.node().child().value,
                                          parent=None, output=Compiler.output(),
                                          args=Objects.arguments())
 
@@ -286,6 +305,36 @@ def test_compiler_if_block_with_elseif(patch, compiler):
     compiler.subtrees.assert_called_with(tree.node('elseif_block'))
 
 
+def test_compiler_if_block_with_many_elseif(patch, compiler):
+    patch.object(Objects, 'expression')
+    patch.many(Compiler, ['add_line', 'subtree', 'subtrees'])
+    tree = Tree('if_block', [Tree('nested_block', []),
+                             Tree('elseif_block', ['1']),
+                             Tree('elseif_block', ['2'])])
+    compiler.if_block(tree)
+    compiler.subtrees.assert_called_with(tree.child(1), tree.child(2))
+
+
+def test_compiler_if_block_conditionals(patch, compiler):
+    """
+    Ensures the if line is open while its elseif and else blocks are
+    compiled, and closed afterwards.
+    """
+    opened = []
+
+    def else_block(tree, parent=None):
+        opened.extend(compiler.conditionals)
+
+    patch.object(Objects, 'expression')
+    patch.object(Compiler, 'add_line')
+    patch.object(Compiler, 'else_block', side_effect=else_block)
+    tree = Tree('if_block', [Tree('nested_block', []),
+                             Tree('else_block', [])])
+    compiler.run(compiler.if_block, tree)
+    assert opened == [tree.line()]
+    assert compiler.conditionals == []
+
+
 def test_compiler_if_block_with_else(patch, compiler):
     patch.object(Objects, 'expression')
     patch.many(Compiler, ['add_line', 'subtree', 'subtrees'])
@@ -405,14 +454,62 @@ def test_compiler_subtree(patch, compiler, method_name):
     tree = Tree(method_name, [])
     compiler.subtree(tree)
     method = getattr(compiler, method_name)
-    method.assert_called_with(tree, parent=None)
+    assert compiler.deferred == [(method, (tree,), {'parent': None})]
 
 
 def test_compiler_subtree_parent(patch, compiler):
     patch.object(Compiler, 'assignment')
     tree = Tree('assignment', [])
     compiler.subtree(tree, parent='1')
-    compiler.assignment.assert_called_with(tree, parent='1')
+    assert compiler.deferred == [(compiler.assignment, (tree, ),
+                                  {'parent': '1'})]
+
+
+def test_compiler_subtree_parse_tree(patch, compiler):
+    patch.object(Compiler, 'parse_tree')
+    tree = Tree('block', [])
+    compiler.subtree(tree)
+    assert compiler.deferred == [(compiler.parse_tree, (tree, ),
+                                  {'parent': None})]
+
+
+def test_compiler_defer(compiler):
+    compiler.defer('function', 'arg', key='value')
+    assert compiler.deferred == [('function', ('arg', ), {'key': 'value'})]
+
+
+def test_compiler_run(compiler):
+    """
+    Ensures scheduled functions run in order, each one followed by what it
+    schedules
+    """
+    calls = []
+
+    def function(name, children=()):
+        calls.append(name)
+        for child in children:
+            compiler.defer(function, child)
+
+    compiler.run(function, 'root', children=['one', 'two'])
+    assert calls == ['root', 'one', 'two']
+
+
+def test_compiler_run_nested(compiler):
+    calls = []
+
+    def inner(name):
+        calls.append(name)
+
+    def outer(name):
+        calls.append(name)
+        compiler.defer(inner, '{}.inner'.format(name))
+
+    def root():
+        compiler.defer(outer, 'first')
+        compiler.defer(outer, 'second')
+
+    compiler.run(root)
+    assert calls == ['first', 'first.inner', 'second', 'second.inner']
 
 
 def test_compiler_subtrees(patch, compiler, tree):
@@ -451,7 +548,8 @@ def test_compiler_compiler():
 def test_compiler_compile(patch):
     patch.many(Compiler, ['parse_tree', 'compiler', 'get_services'])
     result = Compiler.compile('tree')
-    Compiler.compiler().parse_tree.assert_called_with('tree')
+    Compiler.compiler().run.assert_called_with(
+        Compiler.compiler().parse_tree, 'tree')
     expected = {'tree': Compiler.compiler().lines, 'version': version,
                 'services': Compiler.compiler().get_services(),
                 'functions': Compiler.compiler().functions}
@@ -52,24 +52,16 @@ def test_objects_file():
 
 def test_objects_list(patch, tree):
     patch.object(Objects, 'values')
-    tree.children = ['value']
     result = Objects.list(tree)
-    Objects.values.assert_called_with('value')
-    assert result == {'$OBJECT': 'list', 'items': [Objects.values()]}
+    Objects.values.assert_called_with(Tree('values', [tree]))
+    assert result == Objects.values()
 
 
-def test_objects_objects(patch, magic, tree):
-    patch.many(Objects, ['string', 'values'])
-    subtree = magic()
-    tree.children = [subtree]
+def test_objects_objects(patch, tree):
+    patch.object(Objects, 'values')
     result = Objects.objects(tree)
-    subtree.node.assert_called_with('string')
-    subtree.child.assert_called_with(1)
-    Objects.string.assert_called_with(subtree.node())
-    Objects.values.assert_called_with(subtree.child())
-    expected = {'$OBJECT': 'dict', 'items': [[Objects.string(),
-                                              Objects.values()]]}
-    assert result == expected
+    Objects.values.assert_called_with(Tree('values', [tree]))
+    assert result == Objects.values()
 
 
 def test_objects_types(tree):
@@ -88,41 +80,79 @@ def test_objects_method(patch, tree):
     assert result == expected
 
 
-@mark.parametrize('value_type', [
-    'string', 'boolean', 'list', 'number', 'objects', 'types'
-])
-def test_objects_values(patch, magic, value_type):
+def test_objects_values(patch, magic):
+    patch.object(Objects, 'value')
+    tree = magic(child=lambda x: magic(data='number'))
+    result = Objects.values(tree)
+    Objects.value.assert_called_with(tree)
+    assert result == Objects.value()
+
+
+def test_objects_values_list(patch):
+    patch.object(Objects, 'value', side_effect=lambda tree: tree.child(0))
+    tree = Tree('values', [Tree('list', [Tree('values', ['one']),
+                                         Tree('values', ['two'])])])
+    result = Objects.values(tree)
+    assert result == {'$OBJECT': 'list', 'items': ['one', 'two']}
+
+
+def test_objects_values_objects(patch):
+    patch.object(Objects, 'value', side_effect=lambda tree: tree.child(0))
+    patch.object(Objects, 'string', side_effect=lambda tree: tree.child(0))
+    key_value = Tree('key_value', [Tree('string', ['key']),
+                                   Tree('values', ['value'])])
+    tree = Tree('values', [Tree('objects', [key_value])])
+    result = Objects.values(tree)
+    assert result == {'$OBJECT': 'dict', 'items': [['key', 'value']]}
+
+
+def test_objects_values_nested(patch):
+    """
+    Ensures values nested deeper than the recursion limit are compiled
+    """
+    patch.object(Objects, 'value', side_effect=lambda tree: tree.child(0))
+    tree = Tree('values', ['item'])
+    for _ in range(5000):
+        tree = Tree('values', [Tree('list', [tree])])
+    result = Objects.values(tree)
+    for _ in range(5000):
+        result = result['items'][0]
+    assert result == 'item'
+
+
+@mark.parametrize('value_type', ['string', 'boolean', 'number', 'types'])
+def test_objects_value(patch, magic, value_type):
     patch.object(Objects, value_type)
     item = magic(data=value_type)
     tree = magic(child=lambda x: item)
-    result = Objects.values(tree)
+    result = Objects.value(tree)
     getattr(Objects, value_type).assert_called_with(item)
     assert result == getattr(Objects, value_type)()
 
 
-def test_objects_values_method(patch, magic):
+def test_objects_value_method(patch, magic):
     patch.object(Objects, 'method')
     item = magic(data='path')
     tree = magic(child=lambda x: item)
-    result = Objects.values(tree)
+    result = Objects.value(tree)
     Objects.method.assert_called_with(tree)
     assert result == Objects.method()
 
 
-def test_objects_values_filepath(patch, magic):
+def test_objects_value_filepath(patch, magic):
     patch.object(Objects, 'file')
     item = magic(type='FILEPATH')
     tree = magic(child=lambda x: item)
-    result = Objects.values(tree)
+    result = Objects.value(tree)
     Objects.file.assert_called_with(item)
     assert result == Objects.file()
 
 
-def test_objects_values_path(patch, magic):
+def test_objects_value_path(patch, magic):
     patch.object(Objects, 'path')
     item = magic(type='NAME')
     tree = magic(child=lambda x: item)
-    result = Objects.values(tree)
+    result = Objects.value(tree)
     Objects.path.assert_called_with(tree)
     assert result == Objects.path()
 
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from pytest import fixture
 
-from storyscript.exceptions import StoryscriptSyntaxError
+from storyscript.exceptions import ServerError, StoryscriptSyntaxError
 
 
 @fixture
@@ -32,3 +32,8 @@ def test_storyscript_syntax_error__str__tree(patch, magic):
     error = StoryscriptSyntaxError(0, magic(data='data'))
     args = (error.reason(), error.item.line())
     assert str(error) == '{} at line {}'.format(*args)
+
+
+def test_server_error():
+    assert issubclass(ServerError, Exception)
+    assert str(ServerError('message')) == 'message'
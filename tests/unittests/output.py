@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from pytest import raises
+
+from storyscript.output import Output
+
+
+def test_output_write(tmpdir):
+    path = tmpdir.join('output.json')
+    Output.write(str(path), ['con', 'tent'])
+    assert path.read() == 'content'
+    assert tmpdir.listdir() == [path]
+
+
+def test_output_write_error(tmpdir):
+    """
+    Ensures nothing is written when producing the content fails
+    """
+    def chunks():
+        yield 'content'
+        raise ValueError()
+
+    path = tmpdir.join('output.json')
+    with raises(ValueError):
+        Output.write(str(path), chunks())
+    assert tmpdir.listdir() == []
@@ -405,7 +405,7 @@ def test_grammar_types(patch, grammar, ebnf):
 
 def test_grammar_comment(grammar, ebnf):
     grammar.comment()
-    token = token = '/(?<=###)\s(.*|\\n)+(?=\s###)|#(.*)/'
+    token = r'/(?<![^\s])###[ \t]*\n[\s\S]*?\s###.*|#(.*)/'
     ebnf.token.assert_called_with('comment', token, regexp=True)
     ebnf.rule.assert_called_with('comment', 'COMMENT+', raw=True)
 
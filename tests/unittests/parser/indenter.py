@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from lark.indenter import Indenter
+from lark.lexer import Token
 
 from storyscript.parser import CustomIndenter
 
@@ -12,3 +13,15 @@ def test_indenter():
     assert CustomIndenter.INDENT_type == '_INDENT'
     assert CustomIndenter.DEDENT_type == '_DEDENT'
     assert CustomIndenter.tab_len == 8
+
+
+def test_indenter_process():
+    """
+    Ensures the indentation state is reset before processing a stream
+    """
+    indenter = CustomIndenter()
+    indenter.indent_level = [0, 4]
+    indenter.paren_level = 1
+    result = list(indenter.process([Token('NAME', 'x')]))
+    assert result == [Token('NAME', 'x')]
+    assert indenter.indent_level == [0]
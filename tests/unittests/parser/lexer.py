@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from lark.common import PatternRE, PatternStr, TokenDef
+from lark.lexer import Token, UnexpectedInput
+
+from pytest import fixture, raises
+
+from storyscript.parser import CustomIndenter, FastLexer
+
+
+@fixture
+def tokens():
+    return [TokenDef('NAME', PatternRE('[a-z]+')),
+            TokenDef('_WS', PatternRE('(?: )+')),
+            TokenDef('_NL', PatternRE('(\r?\n[\t ]*)+')),
+            TokenDef('_IF', PatternStr('if')),
+            TokenDef('EQUALS', PatternStr('='))]
+
+
+@fixture
+def lexer(tokens):
+    return FastLexer(tokens, indenter=CustomIndenter())
+
+
+def test_lexer_init(lexer):
+    assert lexer.regex.groupindex.keys() == {'NAME', '_WS', '_NL', 'EQUALS'}
+    assert lexer.newline_types == {'_NL'}
+    assert lexer.ignore_types == set()
+    assert lexer.keywords == {'NAME': {'if': '_IF'}}
+    assert isinstance(lexer.indenter, CustomIndenter)
+
+
+def test_lexer_indent(lexer):
+    levels = [0]
+    token = Token('_NL', '\n    ', 3, 1, 3)
+    result = list(lexer.indent(token, levels))
+    assert result == [Token('_INDENT', '    ')]
+    assert result[0].line == 1
+    assert levels == [0, 4]
+
+
+def test_lexer_indent_dedent(lexer):
+    levels = [0, 4, 8]
+    result = list(lexer.indent(Token('_NL', '\n'), levels))
+    assert result == [Token('_DEDENT', ''), Token('_DEDENT', '')]
+    assert levels == [0]
+
+
+def test_lexer_indent_tabs(lexer):
+    levels = [0]
+    list(lexer.indent(Token('_NL', '\n\t '), levels))
+    assert levels == [0, 9]
+
+
+def test_lexer_indent_inconsistent(lexer):
+    with raises(AssertionError):
+        list(lexer.indent(Token('_NL', '\n  '), [0, 4]))
+
+
+def test_lexer_lex(lexer):
+    result = list(lexer.lex('if a\n  b = c\n'))
+    assert [token.type for token in result] == [
+        '_IF', '_WS', 'NAME', '_NL', '_INDENT', 'NAME', '_WS', 'EQUALS',
+        '_WS', 'NAME', '_NL', '_DEDENT']
+    assert (result[5].line, result[5].column) == (2, 2)
+    assert (result[5].end_line, result[5].end_column) == (2, 3)
+    assert (result[3].end_line, result[3].end_column) == (2, 2)
+
+
+def test_lexer_lex_ignore(tokens):
+    lexer = FastLexer(tokens, ignore=['_WS'])
+    result = list(lexer.lex('a = b'))
+    assert result == [Token('NAME', 'a'), Token('EQUALS', '='),
+                      Token('NAME', 'b')]
+    assert result[2].column == 4
+
+
+def test_lexer_lex_unexpected(lexer):
+    with raises(UnexpectedInput) as error:
+        list(lexer.lex('a\nb $'))
+    assert (error.value.line, error.value.column) == (2, 2)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from pytest import raises
+
+import storyscript.parser
+from storyscript.parser import Package
+from storyscript.parser.parser import Parser
+
+
+def test_package():
+    assert isinstance(storyscript.parser, Package)
+
+
+def test_package_getattr():
+    """
+    Ensures classes are imported when first accessed and then kept
+    """
+    package = Package('storyscript.parser')
+    assert 'Parser' not in package.__dict__
+    assert package.Parser is Parser
+    assert package.__dict__['Parser'] is Parser
+
+
+def test_package_getattr_unknown():
+    with raises(AttributeError):
+        storyscript.parser.Unknown
@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import os
 
-from lark import Lark
+from lark import Lark, __version__ as lark_version
 from lark.common import UnexpectedToken
 
-from pytest import fixture, raises
+from pytest import fixture, mark, raises
 
-from storyscript.parser import CustomIndenter, Grammar, Parser, Transformer
+from storyscript.cache import Cache
+from storyscript.parser import (CustomIndenter, Grammar, Parser, Tables,
+                                Transformer, parser as parser_module)
+from storyscript.version import version
 
 
 @fixture
@@ -14,6 +18,21 @@ def parser():
     return Parser()
 
 
+@fixture
+def cache(request, patch):
+    Parser.clear_cache()
+    request.addfinalizer(Parser.clear_cache)
+    patch.object(parser_module, 'standalone', None)
+
+
+@fixture
+def standalone(patch, magic, cache):
+    module = magic(grammar_hash='hash', tables={},
+                   lark_version=lark_version)
+    patch.object(parser_module, 'standalone', module)
+    return module
+
+
 @fixture
 def ebnf_file(request):
     with open('test.ebnf', 'w') as f:
@@ -27,6 +46,7 @@ def ebnf_file(request):
 def test_parser_init(parser):
     assert parser.algo == 'lalr'
     assert parser.ebnf_file is None
+    assert parser.lexer == 'standard'
 
 
 def test_parser_init_algo():
@@ -39,6 +59,53 @@ def test_parser_init_ebnf_file():
     assert parser.ebnf_file == 'grammar.ebnf'
 
 
+def test_parser_init_lexer():
+    parser = Parser(lexer='fast')
+    assert parser.lexer == 'fast'
+
+
+def test_parser_clear_cache():
+    Parser.cache['key'] = 'lark'
+    Parser.default_grammar = 'grammar'
+    Parser.clear_cache()
+    assert Parser.cache == {}
+    assert Parser.default_grammar is None
+
+
+def test_parser_grammar_hash():
+    result = Parser.grammar_hash('grammar')
+    assert result == hashlib.sha256(b'grammar').hexdigest()
+
+
+def test_parser_uses_standalone(standalone, parser):
+    assert parser.uses_standalone() is True
+
+
+def test_parser_uses_standalone_lark_version(standalone, parser):
+    standalone.lark_version = '0.0.1'
+    assert parser.uses_standalone() is False
+
+
+def test_parser_uses_standalone_missing(cache, parser):
+    assert parser.uses_standalone() is False
+
+
+@mark.parametrize('options', [{'ebnf_file': 'test.ebnf'}, {'algo': 'earley'}])
+def test_parser_uses_standalone_options(standalone, options):
+    assert Parser(**options).uses_standalone() is False
+
+
+def test_parser_checksum(patch, cache, parser):
+    patch.many(Parser, ['grammar', 'grammar_hash'])
+    result = parser.checksum()
+    Parser.grammar_hash.assert_called_with(Parser.grammar())
+    assert result == Parser.grammar_hash()
+
+
+def test_parser_checksum_standalone(standalone, parser):
+    assert parser.checksum() == 'hash'
+
+
 def test_parser_indenter(patch, parser):
     patch.init(CustomIndenter)
     assert isinstance(parser.indenter(), CustomIndenter)
@@ -49,7 +116,7 @@ def test_parser_transfomer(patch, parser):
     assert isinstance(parser.transformer(), Transformer)
 
 
-def test_parser_grammar(patch, parser):
+def test_parser_grammar(patch, cache, parser):
     patch.init(Grammar)
     patch.object(Grammar, 'build')
     result = parser.grammar()
@@ -57,21 +124,167 @@ def test_parser_grammar(patch, parser):
     assert result == Grammar().build()
 
 
+def test_parser_grammar_built_once(patch, cache, parser):
+    patch.init(Grammar)
+    patch.object(Grammar, 'build')
+    result = parser.grammar()
+    assert Parser().grammar() == result
+    assert Grammar.__init__.call_count == 1
+
+
 def test_parser_grammar_ebnf_file(parser, ebnf_file):
     parser.ebnf_file = 'test.ebnf'
     assert parser.grammar() == 'grammar'
 
 
-def test_parser_lark(patch, parser):
+def test_parser_build(patch, parser):
     patch.init(Lark)
-    patch.many(Parser, ['indenter', 'grammar'])
-    result = parser.lark()
-    Lark.__init__.assert_called_with(parser.grammar(),
-                                     parser=parser.algo,
+    patch.init(Tables)
+    patch.many(Cache, ['get', 'set'])
+    patch.object(Tables, 'dump')
+    patch.many(Parser, ['indenter', 'transformer', 'tables_fingerprint'])
+    Parser.tables_fingerprint.return_value = 'fingerprint'
+    Cache.get.return_value = None
+    result = parser.build('grammar', 'hash')
+    key = Cache.key('hash', version, lark_version, 'fingerprint')
+    Cache.get.assert_called_with(key)
+    Lark.__init__.assert_called_with('grammar', parser=parser.algo,
                                      postlex=Parser.indenter())
+    Cache.set.assert_called_with(key, Tables.dump())
+    Tables.__init__.assert_called_with(Tables.dump(),
+                                       postlex=Parser.indenter(),
+                                       transformer=Parser.transformer(),
+                                       lexer='standard')
+    assert isinstance(result, Tables)
+
+
+def test_parser_build_cached(patch, parser):
+    patch.init(Lark)
+    patch.init(Tables)
+    patch.many(Cache, ['get', 'set'])
+    patch.many(Parser, ['indenter', 'transformer', 'tables_fingerprint'])
+    parser.build('grammar', 'hash')
+    assert Lark.__init__.call_count == 0
+    assert Cache.set.call_count == 0
+    Tables.__init__.assert_called_with(Cache.get(),
+                                       postlex=Parser.indenter(),
+                                       transformer=Parser.transformer(),
+                                       lexer='standard')
+
+
+def test_parser_build_no_fingerprint(patch, parser):
+    """
+    Ensures tables are neither read from nor written to the cache when the
+    modules handling them can't be fingerprinted
+    """
+    patch.init(Lark)
+    patch.init(Tables)
+    patch.many(Cache, ['get', 'set'])
+    patch.object(Tables, 'dump')
+    patch.many(Parser, ['indenter', 'transformer'])
+    patch.object(Parser, 'tables_fingerprint', return_value='')
+    parser.build('grammar', 'hash')
+    assert Cache.get.call_count == 0
+    assert Cache.set.call_count == 0
+    Tables.__init__.assert_called_with(Tables.dump(),
+                                       postlex=Parser.indenter(),
+                                       transformer=Parser.transformer(),
+                                       lexer='standard')
+
+
+def test_parser_tables_fingerprint(patch):
+    patch.object(Parser, 'fingerprint', None)
+    patch.object(Cache, 'fingerprint', return_value='hash')
+    assert Parser.tables_fingerprint() == 'hash'
+    Cache.fingerprint.assert_called_with('storyscript.parser',
+                                         ['lexer.py', 'tables.py'])
+    assert Parser.fingerprint == 'hash'
+
+
+def test_parser_tables_fingerprint_unreadable(patch):
+    patch.object(Parser, 'fingerprint', None)
+    patch.object(Cache, 'fingerprint', return_value=None)
+    assert Parser.tables_fingerprint() == ''
+
+
+def test_parser_build_earley(patch):
+    patch.init(Lark)
+    patch.object(Cache, 'get')
+    patch.object(Parser, 'indenter')
+    result = Parser(algo='earley').build('grammar', 'hash')
+    Lark.__init__.assert_called_with('grammar', parser='earley',
+                                     postlex=Parser.indenter())
+    assert Cache.get.call_count == 0
     assert isinstance(result, Lark)
 
 
+def test_parser_generate(patch, parser, tmpdir):
+    patch.init(Lark)
+    patch.many(Tables, ['dump', 'source'])
+    patch.many(Parser, ['indenter', 'grammar', 'grammar_hash'])
+    Tables.source.return_value = 'source'
+    path = tmpdir.join('standalone.py')
+    parser.generate(str(path))
+    Lark.__init__.assert_called_with(Parser.grammar(), parser='lalr',
+                                     postlex=Parser.indenter())
+    Tables.source.assert_called_with(Tables.dump(), Parser.grammar_hash())
+    assert path.read() == 'source'
+
+
+def test_parser_lark_standalone(patch, standalone, parser):
+    patch.init(Tables)
+    patch.many(Parser, ['grammar', 'indenter', 'transformer'])
+    result = parser.lark()
+    assert Parser.grammar.call_count == 0
+    Tables.__init__.assert_called_with({}, postlex=Parser.indenter(),
+                                       transformer=Parser.transformer(),
+                                       lexer='standard')
+    assert Parser.cache[('hash', 'lalr', None, 'standard')] == result
+    assert parser.lark() == result
+
+
+def test_parser_lark_standalone_ebnf_file(patch, standalone):
+    patch.many(Parser, ['build', 'grammar', 'grammar_hash'])
+    result = Parser(ebnf_file='test.ebnf').lark()
+    assert result == Parser.build()
+
+
+def test_parser_lark(patch, cache, parser):
+    patch.many(Parser, ['build', 'grammar', 'grammar_hash'])
+    result = parser.lark()
+    Parser.grammar_hash.assert_called_with(Parser.grammar())
+    Parser.build.assert_called_with(Parser.grammar(), Parser.grammar_hash())
+    key = (Parser.grammar_hash(), parser.algo, parser.ebnf_file,
+           parser.lexer)
+    assert Parser.cache[key] == result
+    assert result == Parser.build()
+
+
+def test_parser_lark_cached(patch, cache, parser):
+    patch.many(Parser, ['build', 'grammar'])
+    Parser.grammar.return_value = 'grammar'
+    result = parser.lark()
+    assert Parser(ebnf_file=None).lark() == result
+    assert Parser.build.call_count == 1
+
+
+def test_parser_lark_cached_lexer(patch, cache, parser):
+    patch.many(Parser, ['build', 'grammar'])
+    Parser.grammar.return_value = 'grammar'
+    parser.lark()
+    Parser(lexer='fast').lark()
+    assert Parser.build.call_count == 2
+
+
+def test_parser_lark_cached_grammar_change(patch, cache, parser):
+    patch.many(Parser, ['build', 'grammar'])
+    Parser.grammar.return_value = 'grammar'
+    parser.lark()
+    Parser.grammar.return_value = 'changed'
+    parser.lark()
+    assert Parser.build.call_count == 2
+
+
 def test_parser_parse(patch, parser):
     """
     Ensures the build method can build the grammar
@@ -79,6 +292,16 @@ def test_parser_parse(patch, parser):
     patch.many(Parser, ['lark', 'transformer'])
     result = parser.parse('source')
     Parser.lark().parse.assert_called_with('source\n')
+    assert Parser.transformer().transform.call_count == 0
+    assert result == Parser.lark().parse()
+
+
+def test_parser_parse_earley(patch):
+    """
+    Ensures trees are transformed after parsing when not using LALR
+    """
+    patch.many(Parser, ['lark', 'transformer'])
+    result = Parser(algo='earley').parse('source')
     Parser.transformer().transform.assert_called_with(Parser.lark().parse())
     assert result == Parser.transformer().transform()
 
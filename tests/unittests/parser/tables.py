@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+from lark import Lark, __version__ as lark_version
+from lark.common import PatternRE, PatternStr
+
+from pytest import fixture, mark
+
+from storyscript.parser import (CustomIndenter, FastLexer, Grammar, Tables,
+                                Transformer)
+
+
+@fixture(scope='module')
+def lark():
+    return Lark(Grammar().build(), parser='lalr', postlex=CustomIndenter())
+
+
+@fixture(scope='module')
+def tables(lark):
+    data = pickle.loads(pickle.dumps(Tables.dump(lark)))
+    return Tables(data, postlex=CustomIndenter())
+
+
+@mark.parametrize('pattern, value', [('str', PatternStr),
+                                     ('re', PatternRE)])
+def test_tables_token(pattern, value):
+    result = Tables.token('NAME', pattern, 'value', ('i',), 2)
+    assert result.name == 'NAME'
+    assert isinstance(result.pattern, value)
+    assert result.pattern.value == 'value'
+    assert result.pattern.flags == frozenset(['i'])
+    assert result.priority == 2
+
+
+def test_tables_rule():
+    result = Tables.rule('origin', ('a', 'b'), 'alias', None)
+    assert result.origin == 'origin'
+    assert result.expansion == ['a', 'b']
+    assert result.alias == 'alias'
+    assert result.options is None
+
+
+def test_tables_rule_options():
+    result = Tables.rule('origin', (), None, (True, False, None, False, 1))
+    assert result.options.keep_all_tokens is True
+    assert result.options.priority == 1
+
+
+def test_tables_dump(lark):
+    result = Tables.dump(lark)
+    parse_table = lark.parser.parser.analysis.parse_table
+    assert result['start'] == parse_table.start_state
+    assert result['end'] == parse_table.end_state
+    assert len(result['states']) == len(parse_table.states)
+    assert len(result['rules']) == len(lark.rules)
+    assert len(result['tokens']) == len(lark.lexer_conf.tokens)
+
+
+@mark.parametrize('source', [
+    'a = 1\n',
+    'if x == 1\n    a = [1, 2]\nelse\n    alpine echo text:"hi"\n',
+    'function f a:int -> b:int\n    return b\n',
+    '# comment\nforeach items as item\n    a = {"key":`path`}\n'
+])
+def test_tables_parse(lark, tables, source):
+    assert tables.parse(source) == lark.parse(source)
+
+
+@mark.parametrize('source', [
+    'a = 1\n',
+    'a = [1, {"key":`path`}]\n',
+    'alpine echo text:"hi" as out\n    key:value\n',
+    'if x == 1\n    a = 1\nelse if x\n    a = 2\nelse\n    a = 3\n'
+])
+def test_tables_parse_transformer(lark, source):
+    """
+    Ensures applying the transformer while parsing gives the same tree as
+    transforming it afterwards
+    """
+    data = Tables.dump(lark)
+    tables = Tables(data, postlex=CustomIndenter(), transformer=Transformer())
+    assert tables.parse(source) == Transformer().transform(lark.parse(source))
+
+
+def test_tables_parse_positions(lark):
+    """
+    Ensures trees get positions from the tokens they are built from,
+    including tokens filtered out of the tree
+    """
+    data = Tables.dump(lark)
+    tables = Tables(data, postlex=CustomIndenter(), transformer=Transformer())
+    tree = tables.parse('if a\n    b = 1\nelse\n    b = 2\n')
+    assert tree.position == (1, 0, 4, 9)
+    assert tree.node('block.if_block.else_block').position == (3, 0, 4, 9)
+    assert tree.node('block.if_block.nested_block').position == (2, 4, 2, 9)
+
+
+def test_tables_lex(lark, tables):
+    source = 'if x\n    a = 1\n'
+    assert list(tables.lex(source)) == list(lark.lex(source))
+
+
+def test_tables_lex_fast(lark):
+    data = Tables.dump(lark)
+    tables = Tables(data, postlex=CustomIndenter(), lexer='fast')
+    assert isinstance(tables.lexer, FastLexer)
+    assert tables.postlex is None
+    source = 'if x\n    a = 1\n'
+    assert list(tables.lex(source)) == list(lark.lex(source))
+
+
+def test_tables_source(lark):
+    data = Tables.dump(lark)
+    namespace = {}
+    exec(Tables.source(data, 'hash'), namespace)
+    assert namespace['lark_version'] == lark_version
+    assert namespace['grammar_hash'] == 'hash'
+    assert namespace['tables'] == data
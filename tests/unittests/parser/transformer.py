@@ -4,13 +4,39 @@ from lark import Transformer as LarkTransformer
 from pytest import mark, raises
 
 from storyscript.exceptions import StoryscriptSyntaxError
-from storyscript.parser import Transformer, Tree
+from storyscript.parser import Grammar, Transformer, Tree
 
 
 def test_transformer():
     assert issubclass(Transformer, LarkTransformer)
 
 
+def test_transformer_init(patch):
+    patch.object(Grammar, 'build')
+    assert Transformer().constructors == {}
+    assert Grammar.build.call_count == 0
+
+
+def test_transformer_constructor():
+    result = Transformer().constructor('block')
+    assert result(['matches']) == Tree('block', ['matches'])
+
+
+def test_transformer_constructor_method():
+    transformer = Transformer()
+    assert transformer.constructor('service') == transformer.service
+
+
+def test_transformer_get_func_missing():
+    """
+    Ensures rules missing from the table are added to it
+    """
+    transformer = Transformer()
+    result = transformer._get_func('custom')
+    assert transformer.constructors['custom'] == result
+    assert result(['matches']) == Tree('custom', ['matches'])
+
+
 def test_transformer_arguments():
     assert Transformer().arguments('matches') == Tree('arguments', 'matches')
 
@@ -50,9 +76,15 @@ def test_transformer_assignment_error_dash(magic):
 
 
 @mark.parametrize('rule', ['start', 'line', 'block', 'command', 'statement'])
-def test_transformer_rules(rule):
+def test_transformer_get_func(rule):
     transformer = Transformer()
-    result = getattr(transformer, rule)(['matches'])
+    result = transformer._get_func(rule)(['matches'])
     assert isinstance(result, Tree)
     assert result.data == rule
     assert result.children == ['matches']
+
+
+def test_transformer_get_func_table(patch):
+    transformer = Transformer()
+    transformer.constructors['rule'] = 'constructor'
+    assert transformer._get_func('rule') == 'constructor'
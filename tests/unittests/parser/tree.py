@@ -22,6 +22,68 @@ def test_tree():
     assert issubclass(Tree, LarkTree)
 
 
+def test_tree_item_position_tree():
+    tree = Tree('rule', [])
+    tree.position = (1, 0, 1, 4)
+    assert Tree.item_position(tree) == (1, 0, 1, 4)
+
+
+def test_tree_item_position_token():
+    token = Token('NAME', 'word', line=2, column=4)
+    assert Tree.item_position(token) == (2, 4, 2, 8)
+
+
+def test_tree_item_position_token_newlines():
+    token = Token('DOUBLE_QUOTED', '"one\ntwo"', line=2, column=4)
+    assert Tree.item_position(token) == (2, 4, 3, 4)
+
+
+@mark.parametrize('token', [Token('_NL', '\n', line=1, column=0),
+                            Token('NAME', 'word')])
+def test_tree_item_position_token_none(token):
+    assert Tree.item_position(token) is None
+
+
+def test_tree_item_position_other():
+    assert Tree.item_position('item') is None
+
+
+def test_tree_span():
+    items = [Token('_IF', 'if', line=1, column=0),
+             Token('NAME', 'a', line=1, column=3),
+             Token('_NL', '\n', line=1, column=4)]
+    assert Tree.span(items) == (1, 0, 1, 4)
+
+
+def test_tree_span_none():
+    assert Tree.span([Token('_NL', '\n', line=1, column=4)]) is None
+
+
+def test_tree_positioned(patch):
+    patch.object(Tree, 'span')
+    tree = Tree('rule', [])
+    result = Tree.positioned(lambda items: tree)(['items'])
+    Tree.span.assert_called_with(['items'])
+    assert result.position == Tree.span()
+
+
+def test_tree_positioned_existing(patch):
+    """
+    Ensures trees that already have a position, like single children that
+    are expanded in their parent, keep it
+    """
+    patch.object(Tree, 'span')
+    tree = Tree('rule', [])
+    tree.position = (2, 0, 2, 1)
+    Tree.positioned(lambda items: tree)(['items'])
+    assert tree.position == (2, 0, 2, 1)
+
+
+def test_tree_positioned_token():
+    token = Token('NAME', 'word')
+    assert Tree.positioned(lambda items: token)(['items']) == token
+
+
 def test_tree_walk():
     inner_tree = Tree('inner', [])
     tree = Tree('rule', [inner_tree])
@@ -39,6 +101,47 @@ def test_tree_walk_token():
     assert result == inner_tree
 
 
+def test_tree_index():
+    first = Tree('inner', [1])
+    tree = Tree('rule', [Token('test', 'test'), first, Tree('inner', [2])])
+    assert tree.index() == {'inner': first}
+    assert tree.index() is tree.index()
+
+
+def test_tree_index_children_replaced():
+    tree = Tree('rule', [Tree('inner', [])])
+    tree.index()
+    tree.children = [Tree('other', [])]
+    assert tree.index() == {'other': Tree('other', [])}
+
+
+def test_tree_walk_wide(patch):
+    """
+    Ensures trees with many children are looked up through their index
+    """
+    children = [Tree('child', [number]) for number in range(Tree.index_width)]
+    tree = Tree('rule', children + [Tree('inner', [])])
+    patch.object(Tree, 'index', return_value={'inner': 'inner'})
+    assert Tree.walk(tree, 'inner') == 'inner'
+
+
+def test_tree_walk_wide_missing():
+    tree = Tree('rule', [Tree('child', []) for _ in range(Tree.index_width)])
+    assert Tree.walk(tree, 'inner') is None
+
+
+def test_tree_shards(patch):
+    patch.object(Tree, 'paths', {})
+    assert Tree.shards('one.two') == ('one', 'two')
+    assert Tree.paths == {'one.two': ('one', 'two')}
+
+
+def test_tree_node_nested():
+    inner = Tree('inner', [])
+    tree = Tree('rule', [Tree('outer', [inner])])
+    assert tree.node('outer.inner') == inner
+
+
 def test_tree_node(patch):
     patch.object(Tree, 'walk')
     tree = Tree('rule', [])
@@ -57,6 +160,39 @@ def test_tree_child_overflow():
     assert tree.child(1) is None
 
 
+def test_tree_line_position():
+    tree = Tree('outer', [])
+    tree.position = (3, 0, 4, 1)
+    assert tree.line() == '3'
+
+
+def test_tree_end_line():
+    tree = Tree('outer', [])
+    tree.position = (3, 0, 4, 1)
+    assert tree.end_line() == '4'
+
+
+def test_tree_end_line_no_position():
+    assert Tree('outer', []).end_line() is None
+
+
 def test_tree_line():
     tree = Tree('outer', [Tree('path', [Token('WORD', 'word', line=1)])])
     assert tree.line() == '1'
+
+
+def test_tree_line_deep():
+    tree = Tree('path', [Token('WORD', 'word', line=1)])
+    for _ in range(5000):
+        tree = Tree('outer', [tree])
+    assert tree.line() == '1'
+
+
+def test_tree_line_positioned_child():
+    inner = Tree('inner', [])
+    inner.position = (2, 0, 2, 1)
+    assert Tree('outer', [inner]).line() == '2'
+
+
+def test_tree_line_empty():
+    assert Tree('outer', []).line() is None
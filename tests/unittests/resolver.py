@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+import operator
 import re
 
 from pytest import mark, raises
 
-from storyscript.resolver import Resolver
+from storyscript.resolver import (Constant, Dictionary, Expression, Format,
+                                  List, Method, Pairs, Path, Plan, Resolver,
+                                  Words)
 
 
 def test_resolver_handside(patch):
@@ -90,6 +93,30 @@ def test_resolver_path_key_error():
     assert Resolver.path(['a', 'b'], {}) is None
 
 
+def test_resolver_path_type_error():
+    assert Resolver.path(['a', 'b'], {'a': 1}) is None
+
+
+def test_resolver_path_index_error():
+    with raises(IndexError):
+        Resolver.path(['a', '1'], {'a': []})
+
+
+def test_resolver_compile_path():
+    access = Resolver.compile_path(['a', '0', 'b'])
+    assert access({'a': [{'b': 'value'}]}) == 'value'
+    assert access({'a': {'0': {'b': 'value'}}}) is None
+
+
+def test_resolver_path_accessor(patch):
+    patch.object(Resolver, 'compile_path')
+    patch.object(Resolver, 'accessors', {})
+    result = Resolver.path_accessor(['a', 'b'])
+    assert Resolver.path_accessor(['a', 'b']) == result
+    Resolver.compile_path.assert_called_once_with(('a', 'b'))
+    assert result == Resolver.compile_path()
+
+
 def test_resolver_dictionary(patch):
     patch.object(Resolver, 'resolve')
     result = Resolver.dictionary({'key': 'value'}, 'data')
@@ -129,6 +156,46 @@ def test_resolver_method_notlike(mocker, match, expectation):
     assert result is expectation
 
 
+def test_resolver_regex():
+    Resolver.clear_regexes()
+    result = Resolver.regex('a+')
+    assert result == re.compile('a+')
+    assert Resolver.regex('a+') is result
+    assert Resolver.regex_counters == {'hits': 1, 'misses': 1}
+
+
+def test_resolver_regex_evict(patch):
+    patch.object(Resolver, 'regexes_size', 2)
+    Resolver.clear_regexes()
+    Resolver.regex('a')
+    Resolver.regex('b')
+    Resolver.regex('a')
+    Resolver.regex('c')
+    assert list(Resolver.regexes) == ['a', 'c']
+
+
+def test_resolver_regex_stats():
+    Resolver.clear_regexes()
+    Resolver.regex('a')
+    assert Resolver.regex_stats() == {'hits': 0, 'misses': 1, 'entries': 1,
+                                      'size': Resolver.regexes_size}
+
+
+def test_resolver_clear_regexes():
+    Resolver.regex('a')
+    Resolver.clear_regexes()
+    assert Resolver.regexes == {}
+    assert Resolver.regex_counters == {'hits': 0, 'misses': 0}
+
+
+def test_resolver_like(patch):
+    patch.object(Resolver, 'regex')
+    Resolver.regex.return_value.match.return_value = None
+    assert Resolver.like('left', 'pattern') is False
+    Resolver.regex.assert_called_with('pattern')
+    Resolver.regex.return_value.match.assert_called_with('left')
+
+
 def test_resolver_method_in():
     assert Resolver.method('in', 'left', ['left'])
 
@@ -155,13 +222,49 @@ def test_resolver_method_value_error():
         Resolver.method('unknown', 'left', 'right')
 
 
+@mark.parametrize('expression, source', [
+    ('{} == 1', 'lambda _0, *_: (_0 == 1)'),
+    ('{} > {}', 'lambda _0, _1, *_: (_0 > _1)'),
+    ('{1} - {0}', 'lambda _0, _1, *_: (_1 - _0)'),
+    ('{{1: {}}}[1]', 'lambda _0, *_: ({1: _0}[1])'),
+    ('True', 'lambda *_: (True)')
+])
+def test_resolver_translate(expression, source):
+    assert Resolver.translate(expression) == source
+
+
+@mark.parametrize('expression', ['{0.real}', '{0[1]}', '{!r}', '{:>3}'])
+def test_resolver_translate_unsupported(expression):
+    assert Resolver.translate(expression) is None
+
+
+def test_resolver_compile_expression():
+    function = Resolver.compile_expression('{} == {}')
+    assert function('a"\\', 'a"\\') is True
+    assert function(1, 2) is False
+
+
+def test_resolver_compile_expression_unsupported(patch):
+    patch.object(Resolver, 'stringify', return_value='-2')
+    function = Resolver.compile_expression('{!s} + 1')
+    assert function(2) == -1
+    Resolver.stringify.assert_called_with(2)
+
+
+def test_resolver_expression_function(patch):
+    patch.object(Resolver, 'compile_expression')
+    patch.object(Resolver, 'expressions', {})
+    result = Resolver.expression_function('{} == 1')
+    assert Resolver.expression_function('{} == 1') == result
+    Resolver.compile_expression.assert_called_once_with('{} == 1')
+    assert result == Resolver.compile_expression()
+
+
 def test_resolver_expression(patch):
     patch.object(Resolver, 'values', return_value=[1])
-    patch.object(Resolver, 'stringify', return_value='1')
     result = Resolver.expression('data', '{} == 1', 'values')
     Resolver.values.assert_called_with('values', data='data')
-    Resolver.stringify.assert_called_with(1)
-    assert result
+    assert result is True
 
 
 def test_resolver_object_string(patch):
@@ -197,10 +300,11 @@ def test_resolver_object_dict(patch):
 
 
 def test_resolver_object_regexp(patch):
-    patch.object(re, 'compile')
+    patch.object(Resolver, 'regex')
     expression = {'$OBJECT': 'regexp', 'regexp': 'regular'}
-    Resolver.object(expression, 'data')
-    re.compile.assert_called_with('regular')
+    result = Resolver.object(expression, 'data')
+    Resolver.regex.assert_called_with('regular')
+    assert result == Resolver.regex.return_value
 
 
 def test_resolver_object_value():
@@ -309,3 +413,240 @@ def test_resolver_resolve_list(patch):
     result = Resolver.resolve([], 'data')
     Resolver.list.assert_called_with([], 'data')
     assert result == Resolver.list()
+
+
+def test_plan_slots_base():
+    assert Plan.__slots__ == ()
+    assert issubclass(Constant, Plan)
+
+
+def test_plan_slots():
+    with raises(AttributeError):
+        Constant('value').other = 'other'
+
+
+def test_constant_resolve():
+    assert Constant('value').resolve('data') == 'value'
+
+
+def test_path_resolve(magic):
+    access = magic()
+    assert Path(access).resolve('data') == access.return_value
+    access.assert_called_with('data')
+
+
+def test_format_resolve():
+    plan = Format('{} {}', (Constant('a'), Path(len)))
+    assert plan.resolve('data') == 'a 4'
+
+
+def test_expression_resolve(magic):
+    function = magic()
+    plan = Expression(function, (Constant(1), Path(len)))
+    assert plan.resolve('data') == function.return_value
+    function.assert_called_with(1, 4)
+
+
+def test_method_resolve(magic):
+    operator = magic()
+    plan = Method(operator, Constant(1), Path(len))
+    assert plan.resolve('data') == operator.return_value
+    operator.assert_called_with(1, 4)
+
+
+def test_dictionary_resolve():
+    plan = Dictionary((('a', Constant(1)), ('b', Path(len))))
+    assert plan.resolve('data') == {'a': 1, 'b': 4}
+
+
+def test_pairs_resolve():
+    plan = Pairs(((Path(str), Constant(1)), (Constant(list), Constant(2))))
+    assert plan.resolve('data') == {'data': 1}
+
+
+def test_list_resolve():
+    assert List((Constant(1), Path(len))).resolve('data') == [1, 4]
+
+
+def test_words_resolve():
+    assert Words((Constant('a'), Path(str))).resolve('data') == 'a data'
+
+
+def test_words_resolve_boolean():
+    assert Words((Constant(True), )).resolve('data') == [True]
+
+
+def test_resolver_compile_values(patch):
+    patch.object(Resolver, 'compile')
+    result = Resolver.compile_values(['value'])
+    Resolver.compile.assert_called_with('value')
+    assert result == (Resolver.compile.return_value, )
+
+
+@mark.parametrize('object_type', ['string', 'file'])
+def test_resolver_compile_object_string(object_type):
+    item = {'$OBJECT': object_type, 'string': 'a', 'values': []}
+    result = Resolver.compile_object(item)
+    assert type(result) is Constant
+    assert result.value == 'a'
+
+
+@mark.parametrize('object_type', ['string', 'file'])
+def test_resolver_compile_object_string_values(patch, object_type):
+    patch.object(Resolver, 'compile_values')
+    item = {'$OBJECT': object_type, 'string': '{}', 'values': ['value']}
+    result = Resolver.compile_object(item)
+    Resolver.compile_values.assert_called_with(['value'])
+    assert type(result) is Format
+    assert result.string == '{}'
+    assert result.values == Resolver.compile_values.return_value
+
+
+def test_resolver_compile_object_path(patch):
+    patch.object(Resolver, 'path_accessor')
+    result = Resolver.compile_object({'$OBJECT': 'path', 'paths': ['a']})
+    Resolver.path_accessor.assert_called_with(['a'])
+    assert type(result) is Path
+    assert result.access == Resolver.path_accessor.return_value
+
+
+def test_resolver_compile_object_regexp(patch):
+    patch.object(Resolver, 'regex')
+    result = Resolver.compile_object({'$OBJECT': 'regexp', 'regexp': 'a'})
+    Resolver.regex.assert_called_with('a')
+    assert result.value == Resolver.regex.return_value
+
+
+def test_resolver_compile_object_value():
+    result = Resolver.compile_object({'$OBJECT': 'value', 'value': 1})
+    assert type(result) is Constant
+    assert result.value == 1
+
+
+def test_resolver_compile_object_method():
+    item = {'$OBJECT': 'method', 'method': 'is',
+            'left': {'$OBJECT': 'value', 'value': 1},
+            'right': {'$OBJECT': 'value', 'value': 2}}
+    result = Resolver.compile_object(item)
+    assert type(result) is Method
+    assert result.operator == Resolver.operators['is']
+    assert (result.left.value, result.right.value) == (1, 2)
+
+
+@mark.parametrize('method', ['like', 'notlike'])
+def test_resolver_compile_object_method_like(patch, method):
+    patch.object(Resolver, 'regex')
+    item = {'$OBJECT': 'method', 'method': method,
+            'left': {'$OBJECT': 'path', 'paths': ['a']},
+            'right': {'$OBJECT': 'string', 'string': '^a'}}
+    result = Resolver.compile_object(item)
+    Resolver.regex.assert_called_with('^a')
+    assert result.right.value == Resolver.regex.return_value
+
+
+def test_resolver_compile_object_method_unknown():
+    item = {'$OBJECT': 'method', 'method': 'unknown',
+            'left': {'$OBJECT': 'value', 'value': 1},
+            'right': {'$OBJECT': 'value', 'value': 2}}
+    plan = Resolver.compile_object(item)
+    with raises(ValueError):
+        plan.resolve('data')
+
+
+def test_resolver_compile_object_expression(patch):
+    patch.many(Resolver, ['expression_function', 'compile_values'])
+    item = {'$OBJECT': 'expression', 'expression': '{}', 'values': ['v']}
+    result = Resolver.compile_object(item)
+    Resolver.expression_function.assert_called_with('{}')
+    Resolver.compile_values.assert_called_with(['v'])
+    assert type(result) is Expression
+    assert result.function == Resolver.expression_function.return_value
+    assert result.values == Resolver.compile_values.return_value
+
+
+def test_resolver_compile_object_argument():
+    item = {'$OBJECT': 'argument',
+            'argument': {'$OBJECT': 'value', 'value': 1}}
+    assert Resolver.compile_object(item).value == 1
+
+
+def test_resolver_compile_object_dict():
+    item = {'$OBJECT': 'dict',
+            'items': [[{'$OBJECT': 'string', 'string': 'key'},
+                       {'$OBJECT': 'value', 'value': 1}]]}
+    result = Resolver.compile_object(item)
+    assert type(result) is Pairs
+    assert result.resolve('data') == {'key': 1}
+
+
+def test_resolver_compile_object_list(patch):
+    patch.object(Resolver, 'compile_values')
+    result = Resolver.compile_object({'$OBJECT': 'list', 'items': ['item']})
+    Resolver.compile_values.assert_called_with(['item'])
+    assert type(result) is List
+    assert result.items == Resolver.compile_values.return_value
+
+
+def test_resolver_compile_object_dictionary(patch):
+    patch.object(Resolver, 'compile')
+    result = Resolver.compile_object({'key': 'value'})
+    Resolver.compile.assert_called_with('value')
+    assert type(result) is Dictionary
+    assert result.items == (('key', Resolver.compile.return_value), )
+
+
+def test_resolver_compile(patch):
+    result = Resolver.compile('item')
+    assert type(result) is Constant
+    assert result.value == 'item'
+
+
+def test_resolver_compile_object_call(patch):
+    patch.object(Resolver, 'compile_object')
+    result = Resolver.compile({})
+    Resolver.compile_object.assert_called_with({})
+    assert result == Resolver.compile_object.return_value
+
+
+def test_resolver_compile_list(patch):
+    patch.object(Resolver, 'compile_values')
+    result = Resolver.compile(['item'])
+    Resolver.compile_values.assert_called_with(['item'])
+    assert type(result) is Words
+    assert result.items == Resolver.compile_values.return_value
+
+
+@mark.parametrize('expression, function', [
+    ('{} == {}', operator.eq), ('{} != {}', operator.ne),
+    ('{} < {}', operator.lt), ('{} <= {}', operator.le),
+    ('{} > {}', operator.gt), ('{} >= {}', operator.ge)
+])
+def test_resolver_compile_object_comparison(expression, function):
+    item = {'$OBJECT': 'expression', 'expression': expression,
+            'values': [{'$OBJECT': 'path', 'paths': ['a']}, 1]}
+    result = Resolver.compile_object(item)
+    assert type(result) is Method
+    assert result.operator == function
+    assert result.right.value == 1
+
+
+def test_resolver_resolve_many(patch):
+    item = {'$OBJECT': 'path', 'paths': ['a']}
+    assert Resolver.resolve_many(item, iter([{'a': 1}, {}])) == [1, None]
+
+
+def test_resolver_resolve_many_compile(patch):
+    patch.object(Resolver, 'compile')
+    result = Resolver.resolve_many('item', ['one', 'two'])
+    assert Resolver.compile.call_count == 1
+    Resolver.compile.assert_called_with('item')
+    Resolver.compile().resolve.assert_called_with('two')
+    assert result == [Resolver.compile().resolve()] * 2
+
+
+def test_resolver_resolve_many_method():
+    item = {'$OBJECT': 'method', 'method': 'in',
+            'left': {'$OBJECT': 'value', 'value': 'a'},
+            'right': {'$OBJECT': 'path', 'paths': ['b']}}
+    result = Resolver.resolve_many(item, [{'b': 'abc'}, {'b': 'xyz'}])
+    assert result == [True, False]
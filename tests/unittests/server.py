@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import socket
+import stat
+
+from pytest import fixture, raises
+
+from storyscript.app import App
+from storyscript.exceptions import ServerError
+from storyscript.parser import Parser
+from storyscript.server import Handler, Server, default_socket, \
+    private_directory, socket_directory, stale_socket
+from storyscript.version import version
+
+
+@fixture
+def server(patch):
+    patch.init(Server)
+    server = Server()
+    server.path = 'test.sock'
+    server.ebnf_file = None
+    return server
+
+
+def test_default_socket(monkeypatch):
+    monkeypatch.setenv('STORYSCRIPT_SOCKET', 'test.sock')
+    assert default_socket() == 'test.sock'
+
+
+def test_socket_directory(monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', '/run')
+    expected = '/run/storyscript-{}'.format(os.getuid())
+    assert socket_directory() == expected
+
+
+def test_default_socket_directory(patch, monkeypatch):
+    monkeypatch.delenv('STORYSCRIPT_SOCKET', raising=False)
+    patch('storyscript.server.socket_directory', return_value='/run/ss')
+    assert default_socket() == '/run/ss/daemon.sock'
+
+
+def test_private_directory(tmpdir):
+    directory = str(tmpdir.join('private'))
+    private_directory(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    private_directory(directory)
+
+
+def test_private_directory_open(tmpdir):
+    """
+    Ensures directories that others can access are refused
+    """
+    directory = tmpdir.mkdir('open')
+    directory.chmod(0o777)
+    with raises(ServerError):
+        private_directory(str(directory))
+
+
+def test_private_directory_owner(patch, tmpdir):
+    patch.object(os, 'getuid', return_value=os.getuid() + 1)
+    with raises(ServerError):
+        private_directory(str(tmpdir.mkdir('other')))
+
+
+def test_stale_socket(tmpdir):
+    path = str(tmpdir.join('test.sock'))
+    assert stale_socket(path) is False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        assert stale_socket(path) is True
+        server.listen()
+        assert stale_socket(path) is False
+
+
+def test_stale_socket_file(tmpdir):
+    path = tmpdir.join('test.sock')
+    path.write('')
+    assert stale_socket(str(path)) is False
+
+
+def test_handler(magic):
+    handler = Handler.__new__(Handler)
+    handler.rfile = io.BytesIO(b'{"command": "compile"}')
+    handler.wfile = io.BytesIO()
+    handler.server = magic()
+    handler.server.respond.return_value = {'result': 'ok'}
+    handler.handle()
+    handler.server.respond.assert_called_with({'command': 'compile'})
+    assert json.loads(handler.wfile.getvalue()) == {'result': 'ok'}
+
+
+def test_handler_invalid(magic):
+    handler = Handler.__new__(Handler)
+    handler.rfile = io.BytesIO(b'invalid')
+    handler.wfile = io.BytesIO()
+    handler.handle()
+    assert json.loads(handler.wfile.getvalue()) == {'error':
+                                                    'Invalid request'}
+
+
+def test_server_compile(patch, server):
+    patch.object(App, 'compile')
+    result = server.compile({'path': 'stories', 'jobs': 2})
+    App.compile.assert_called_with('stories', ebnf_file=None, jobs=2,
+                                   compact=False, jsonl=False)
+    assert result == App.compile()
+
+
+def test_server_compile_jsonl(patch, server):
+    patch.object(App, 'compile')
+    server.compile({'path': 'stories', 'compact': True, 'jsonl': True})
+    App.compile.assert_called_with('stories', ebnf_file=None, jobs=1,
+                                   compact=True, jsonl=True)
+
+
+def test_server_compile_source(patch, server):
+    patch.object(App, 'compile_source')
+    result = server.compile({'source': 'a = 1'})
+    App.compile_source.assert_called_with('a = 1', ebnf_file=None)
+    assert result == App.compile_source()
+
+
+def test_server_lex(patch, magic, server):
+    patch.object(App, 'lex')
+    App.lex.return_value = [('one.story', [magic(type='NAME', value='a')])]
+    result = server.lex({'path': 'stories'})
+    App.lex.assert_called_with('stories')
+    assert result == {'one.story': [['NAME', 'a']]}
+
+
+def test_server_lex_source(patch, magic, server):
+    patch.init(Parser)
+    patch.object(Parser, 'lex', return_value=[magic(type='NAME', value='a')])
+    result = server.lex({'source': 'a'})
+    Parser.lex.assert_called_with('a')
+    assert result == {'source': [['NAME', 'a']]}
+
+
+def test_server_parse(patch, server):
+    patch.init(Parser)
+    patch.object(Parser, 'parse')
+    result = server.parse({'source': 'a = 1'})
+    Parser.parse.assert_called_with('a = 1')
+    assert result == Parser.parse().pretty()
+
+
+def test_server_parse_path(patch, server):
+    patch.init(Parser)
+    patch.object(Parser, 'parse')
+    patch.object(App, 'read_story')
+    server.parse({'path': 'one.story'})
+    App.read_story.assert_called_with('one.story')
+    Parser.parse.assert_called_with(App.read_story())
+
+
+def test_server_respond(patch, server):
+    patch.object(Server, 'compile')
+    patch.object(os, 'chdir')
+    result = server.respond({'command': 'compile', 'cwd': '/stories'})
+    os.chdir.assert_called_with('/stories')
+    assert result == {'result': Server.compile()}
+
+
+def test_server_respond_mismatch(patch, server):
+    patch.object(Server, 'mismatch', return_value={'error': 'mismatch'})
+    result = server.respond({'command': 'compile'})
+    assert result == {'error': 'mismatch'}
+
+
+def test_server_mismatch(server):
+    request = {'version': version, 'ebnf_file': None}
+    assert server.mismatch(request) is None
+    assert server.mismatch({}) is None
+
+
+def test_server_mismatch_version(server):
+    result = server.mismatch({'version': '0.0.1'})
+    assert result == {'error': 'The daemon runs storyscript {}'.format(
+        version), 'mismatch': True}
+
+
+def test_server_mismatch_ebnf_file(server):
+    result = server.mismatch({'ebnf_file': '/test.ebnf'})
+    assert result == {'error': 'The daemon uses the grammar default',
+                      'mismatch': True}
+
+
+def test_server_respond_unknown(server):
+    result = server.respond({'command': 'unknown'})
+    assert result == {'error': 'Unknown command unknown'}
+
+
+def test_server_respond_error(patch, server):
+    patch.object(Server, 'compile', side_effect=ValueError('wrong'))
+    result = server.respond({'command': 'compile'})
+    assert result == {'error': 'ValueError: wrong'}
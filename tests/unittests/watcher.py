@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import select
+import sys
+import time
+
+from pytest import fixture, mark
+
+from storyscript.watcher import Inotify, Watcher
+
+
+linux = mark.skipif(not sys.platform.startswith('linux'),
+                    reason='inotify is available only on linux')
+
+
+@fixture
+def finder(magic):
+    return magic(return_value=[])
+
+
+@fixture
+def watcher(patch, finder):
+    patch.object(Inotify, 'available', return_value=False)
+    return Watcher('path', finder)
+
+
+@fixture
+def story(tmpdir):
+    story = tmpdir.join('one.story')
+    story.write('a = 1')
+    return str(story)
+
+
+def test_inotify_available(patch):
+    patch.object(sys, 'platform', 'darwin')
+    assert Inotify.available() is False
+
+
+@linux
+def test_inotify(tmpdir):
+    inotify = Inotify()
+    inotify.add(str(tmpdir))
+    assert inotify.wait(timeout=0) is False
+    tmpdir.join('one.story').write('a = 1')
+    assert inotify.wait(timeout=1) is True
+    assert inotify.wait(timeout=0) is False
+    inotify.close()
+
+
+def test_watcher_init(watcher, finder):
+    assert watcher.path == 'path'
+    assert watcher.finder == finder
+    assert watcher.interval == 0.5
+    assert watcher.inotify is None
+
+
+def test_watcher_init_inotify(patch, finder):
+    patch.object(Inotify, 'available', return_value=True)
+    patch.init(Inotify)
+    assert isinstance(Watcher('path', finder).inotify, Inotify)
+
+
+def test_watcher_snapshot(watcher, finder, story):
+    finder.return_value = [story, 'missing.story']
+    stat = os.stat(story)
+    assert watcher.snapshot() == {story: (stat.st_mtime_ns, stat.st_size)}
+    finder.assert_called_with('path')
+
+
+def test_watcher_directories(watcher, tmpdir):
+    tmpdir.mkdir('sub')
+    watcher.path = str(tmpdir)
+    result = list(watcher.directories())
+    assert result == [str(tmpdir), str(tmpdir.join('sub'))]
+
+
+@mark.parametrize('path, directory', [('one.story', '.'),
+                                      ('stories/one.story', 'stories')])
+def test_watcher_directories_file(watcher, path, directory):
+    watcher.path = path
+    assert list(watcher.directories()) == [directory]
+
+
+def test_watcher_wait(patch, watcher):
+    patch.object(time, 'sleep')
+    watcher.wait()
+    time.sleep.assert_called_with(watcher.interval)
+
+
+def test_watcher_wait_inotify(patch, magic, watcher):
+    patch.object(time, 'sleep')
+    patch.object(Watcher, 'add_watches')
+    watcher.inotify = magic()
+    watcher.wait()
+    assert Watcher.add_watches.call_count == 1
+    assert watcher.inotify.wait.call_count == 1
+    assert watcher.inotify.drain.call_count == 1
+
+
+def test_watcher_changes(watcher):
+    previous = {'one': (1, 1), 'two': (1, 1), 'three': (1, 1)}
+    current = {'one': (1, 1), 'two': (2, 1), 'four': (1, 1)}
+    result = watcher.changes(previous, current)
+    assert result == (['two', 'four'], ['three'])
+
+
+def test_watcher_watch(patch, watcher):
+    patch.many(Watcher, ['wait', 'snapshot'])
+    Watcher.snapshot.side_effect = [{'one': 1}, {'one': 1}, {'two': 1}]
+    watch = watcher.watch()
+    assert next(watch) == (['one'], [])
+    assert next(watch) == (['two'], ['one'])
+    assert Watcher.wait.call_count == 2